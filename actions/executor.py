@@ -1,13 +1,25 @@
 import asyncio
-import json
-from typing import Dict, Any, Tuple
-import requests
+import logging
+import random
+from typing import Dict, Any, List, Optional, Tuple
+import aiohttp
+import orjson
 from strand_agents import Agent, AgentConfig
 from models.alert import Alert
 from models.classification import Classification
 from config import Config
 
 
+# Alert severity to SuperOps ticket priority
+_SEVERITY_TO_PRIORITY = {
+    "Critical": "High",
+    "High": "High",
+    "Medium": "Medium",
+    "Low": "Low",
+    "Info": "Low"
+}
+
+
 class ActionAgent(Agent):
     """Strand Agent for executing classified actions."""
     
@@ -18,14 +30,31 @@ class ActionAgent(Agent):
         )
         super().__init__(config)
         self.session = None
+        
+        # Action name -> handler coroutine
+        self._dispatch = {
+            "reboot": self._execute_reboot,
+            "notify_client": self._notify_client,
+            "create_ticket": self._create_ticket,
+            "ignore": self._ignore_alert
+        }
     
     async def initialize(self):
         """Initialize HTTP session for webhook calls."""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'NinjaTriage-AI/1.0',
-            'Content-Type': 'application/json'
-        })
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            connector=aiohttp.TCPConnector(
+                limit=300,
+                limit_per_host=75,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True
+            ),
+            headers={
+                'User-Agent': 'NinjaTriage-AI/1.0',
+                'Content-Type': 'application/json'
+            }
+        )
         self.log_info("Action agent initialized")
     
     async def execute_action(self, alert: Alert, classification: Classification) -> Tuple[str, str]:
@@ -35,23 +64,36 @@ class ActionAgent(Agent):
             
             self.log_info(f"Executing action '{action}' for alert {alert.id}")
             
-            if action == "reboot":
-                return await self._execute_reboot(alert)
-            elif action == "notify_client":
-                return await self._notify_client(alert, classification)
-            elif action == "create_ticket":
-                return await self._create_ticket(alert, classification)
-            elif action == "ignore":
-                return await self._ignore_alert(alert, classification)
-            else:
+            handler = self._dispatch.get(action)
+            if handler is None:
                 self.log_error(f"Unknown action: {action}")
                 return "unknown_action", "error"
+            
+            return await handler(alert, classification)
                 
         except Exception as e:
             self.log_error(f"Failed to execute action for alert {alert.id}: {e}")
             return f"execution_failed", "error"
     
-    async def _execute_reboot(self, alert: Alert) -> Tuple[str, str]:
+    async def execute_many(
+        self,
+        pairs: List[Tuple[Alert, Classification]],
+        concurrency: int = 16
+    ) -> List[Tuple[str, str]]:
+        """Execute actions for several alerts concurrently, preserving input order.
+        
+        Handlers must only wait via awaitables (e.g. asyncio.sleep) so that
+        in-flight actions overlap instead of blocking each other.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _execute_one(alert: Alert, classification: Classification) -> Tuple[str, str]:
+            async with semaphore:
+                return await self.execute_action(alert, classification)
+        
+        return await asyncio.gather(*(_execute_one(alert, classification) for alert, classification in pairs))
+    
+    async def _execute_reboot(self, alert: Alert, classification: Optional[Classification] = None) -> Tuple[str, str]:
         """Simulate device reboot command."""
         try:
             self.log_info(f"Simulating reboot for device: {alert.device_name}")
@@ -62,11 +104,13 @@ class ActionAgent(Agent):
             # In a real implementation, this would send actual reboot commands
             # via NinjaRMM API or other management tools
             
-            print(f"🔄 REBOOT EXECUTED: {alert.device_name}")
-            print(f"   Reason: {alert.description}")
-            print(f"   Command: Restart-Computer -ComputerName {alert.device_name} -Force")
-            
-            self.log_info(f"Reboot command simulated for {alert.device_name}")
+            self._emit_action({
+                "event": "reboot_executed",
+                "alert_id": alert.id,
+                "device": alert.device_name,
+                "reason": alert.description,
+                "command": f"Restart-Computer -ComputerName {alert.device_name} -Force"
+            })
             return "reboot_simulated", "success"
             
         except Exception as e:
@@ -84,13 +128,14 @@ class ActionAgent(Agent):
             # In a real implementation, this would integrate with email service
             # or client notification system
             
-            print(f"📧 EMAIL SENT TO CLIENT")
-            print(f"   Device: {alert.device_name}")
-            print(f"   Issue: {alert.alert_type}")
-            print(f"   Action Required: {classification.reason}")
-            print(f"   To: client-{alert.device_name.lower()}@company.com")
-            
-            self.log_info(f"Client notification sent for {alert.device_name}")
+            self._emit_action({
+                "event": "client_notified",
+                "alert_id": alert.id,
+                "device": alert.device_name,
+                "issue": alert.alert_type,
+                "action_required": classification.reason,
+                "to": f"client-{alert.device_name.lower()}@company.com"
+            })
             return "client_notified", "success"
             
         except Exception as e:
@@ -111,36 +156,60 @@ class ActionAgent(Agent):
                 "alert_id": alert.id,
                 "classification_reason": classification.reason,
                 "confidence": classification.confidence,
-                "timestamp": alert.timestamp.isoformat(),
+                "timestamp": alert.iso_timestamp(),
                 "source": "NinjaTriage-AI"
             }
             
-            # Send to SuperOps webhook
-            response = self.session.post(
-                Config.SUPEROPS_WEBHOOK_URL,
-                json=ticket_payload,
-                timeout=30
-            )
-            
-            if response.status_code in [200, 201, 202]:
-                print(f"🎫 TICKET CREATED")
-                print(f"   Title: {ticket_payload['title']}")
-                print(f"   Priority: {ticket_payload['priority']}")
-                print(f"   Webhook Response: {response.status_code}")
-                
-                self.log_info(f"Ticket created successfully for alert {alert.id}")
-                return "ticket_created", "success"
-            else:
-                self.log_error(f"Webhook returned status {response.status_code}: {response.text}")
-                return "ticket_failed", "error"
+            # Send to SuperOps webhook, retrying transient failures
+            max_retries = max(1, Config.RETRY_ATTEMPTS)  # Always make at least one attempt
+            network_error = None
+            
+            for attempt in range(max_retries):
+                try:
+                    async with self.session.post(
+                        Config.SUPEROPS_WEBHOOK_URL,
+                        data=orjson.dumps(ticket_payload)
+                    ) as response:
+                        status = response.status
+                        text = await response.text()
+                    network_error = None
+                except aiohttp.ClientError as e:
+                    network_error = e
+                    self.log_warning(f"Ticket attempt {attempt + 1}/{max_retries} failed: {e}")
+                else:
+                    if status in [200, 201, 202]:
+                        self._emit_action({
+                            "event": "ticket_created",
+                            "alert_id": alert.id,
+                            "title": ticket_payload["title"],
+                            "priority": ticket_payload["priority"],
+                            "webhook_status": status
+                        })
+                        return "ticket_created", "success"
+                    
+                    self.log_warning(f"Ticket attempt {attempt + 1}/{max_retries} returned status {status}")
+                    if status < 500:
+                        break  # Client errors will not succeed on retry
                 
-        except requests.exceptions.RequestException as e:
-            self.log_error(f"Network error creating ticket: {e}")
-            # Still log as attempted for audit trail
-            print(f"🎫 TICKET CREATION ATTEMPTED (Network Error)")
-            print(f"   Device: {alert.device_name}")
-            print(f"   Error: {str(e)[:100]}")
-            return "ticket_network_error", "error"
+                if attempt < max_retries - 1:
+                    # Full jitter keeps concurrent alerts from retrying in lockstep
+                    await asyncio.sleep(random.uniform(0, min(45, 0.5 * (2 ** attempt))))
+            
+            self._dead_letter(ticket_payload)
+            
+            if network_error:
+                self.log_error(f"Network error creating ticket: {network_error}")
+                # Still log as attempted for audit trail
+                self._emit_action({
+                    "event": "ticket_attempted",
+                    "alert_id": alert.id,
+                    "device": alert.device_name,
+                    "error": str(network_error)[:100]
+                })
+                return "ticket_network_error", "error"
+            
+            self.log_error(f"Webhook returned status {status}: {text}")
+            return "ticket_failed", "error"
             
         except Exception as e:
             self.log_error(f"Failed to create ticket for alert {alert.id}: {e}")
@@ -149,31 +218,40 @@ class ActionAgent(Agent):
     async def _ignore_alert(self, alert: Alert, classification: Classification) -> Tuple[str, str]:
         """Log ignored alert."""
         try:
-            print(f"⏭️  ALERT IGNORED")
-            print(f"   Device: {alert.device_name}")
-            print(f"   Type: {alert.alert_type}")
-            print(f"   Reason: {classification.reason}")
-            
-            self.log_info(f"Alert {alert.id} ignored: {classification.reason}")
+            self._emit_action({
+                "event": "alert_ignored",
+                "alert_id": alert.id,
+                "device": alert.device_name,
+                "type": alert.alert_type,
+                "reason": classification.reason
+            })
             return "alert_ignored", "success"
             
         except Exception as e:
             self.log_error(f"Failed to ignore alert {alert.id}: {e}")
             return "ignore_failed", "error"
     
+    def _emit_action(self, event: Dict[str, Any]):
+        """Log an executed action as a single structured record."""
+        # Skip serializing the event when INFO records would be discarded anyway
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log_info(orjson.dumps(event).decode())
+    
+    def _dead_letter(self, ticket_payload: Dict[str, Any]):
+        """Append an undeliverable ticket payload to the dead-letter file."""
+        try:
+            with open(f"{Config.LOG_FILE}.dlq", 'ab') as f:
+                f.write(orjson.dumps(ticket_payload, option=orjson.OPT_APPEND_NEWLINE))
+            self.log_warning(f"Ticket for alert {ticket_payload['alert_id']} written to dead-letter queue")
+        except Exception as e:
+            self.log_error(f"Failed to write dead-letter entry: {e}")
+    
     def _map_severity_to_priority(self, severity: str) -> str:
         """Map alert severity to ticket priority."""
-        severity_map = {
-            "Critical": "High",
-            "High": "High", 
-            "Medium": "Medium",
-            "Low": "Low",
-            "Info": "Low"
-        }
-        return severity_map.get(severity, "Medium")
+        return _SEVERITY_TO_PRIORITY.get(severity, "Medium")
     
     async def cleanup(self):
         """Cleanup HTTP session."""
         if self.session:
-            self.session.close()
+            await self.session.close()
         self.log_info("Action agent cleanup completed")
\ No newline at end of file
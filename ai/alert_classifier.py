@@ -1,33 +1,193 @@
+import asyncio
 import json
-import boto3
-from typing import Optional
+import re
+import string
+import orjson
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional
 from strand_agents import Agent, AgentConfig
 from models.alert import Alert
 from models.classification import Classification
 from config import Config
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Demo classification rules as (keywords, classification), listed in
+# priority order: the first rule with a matching keyword wins. The
+# classifications are frozen, so one shared instance serves every alert.
+_DEMO_RULES = (
+    # Reboot patterns - High confidence
+    (
+        ('reboot', 'restart', 'pending reboot', 'windows update', 'security update'),
+        Classification("reboot", "System requires restart after Windows Security Updates installation", "High")
+    ),
+    # Critical system issues - High confidence
+    (
+        ('service stopped', 'sql server', 'database', 'critical error', 'system down'),
+        Classification("create_ticket", "Critical SQL Server service failure requires immediate attention", "High")
+    ),
+    # Client-actionable issues - High confidence for disk space
+    (
+        ('disk space', 'storage', 'drive full', 'documents folder'),
+        Classification("notify_client", "User documents folder consuming excessive space, requires client cleanup", "High")
+    ),
+    # Network/hardware issues - Medium confidence
+    (
+        ('offline', 'printer', 'network', 'connectivity', 'unreachable'),
+        Classification("create_ticket", "Network connectivity issue requires technician investigation", "Medium")
+    ),
+    # Security issues - High confidence
+    (
+        ('security', 'failed login', 'firewall', 'blocked'),
+        Classification("create_ticket", "Security alert requires immediate investigation", "High")
+    ),
+    # Minor issues that can be ignored - Medium confidence
+    (
+        ('antivirus update', 'temporary', 'low battery', 'retry'),
+        Classification("ignore", "Temporary network issue, will retry automatically", "Medium")
+    ),
+)
+
+# Default to create ticket for unknown issues
+_DEMO_DEFAULT = Classification("create_ticket", "Unknown issue pattern requires technician review", "Low")
+
+# Rule-based fallback classification rules, in priority order
+_FALLBACK_RULES = (
+    # Reboot patterns
+    (
+        ('reboot', 'restart', 'pending reboot', 'windows update'),
+        Classification("reboot", "Detected reboot-related keywords in alert", "Medium")
+    ),
+    # Critical system issues
+    (
+        ('service stopped', 'system down', 'critical error'),
+        Classification("create_ticket", "Critical system issue detected", "Medium")
+    ),
+    # Client-actionable issues
+    (
+        ('disk space', 'user', 'password', 'login'),
+        Classification("notify_client", "Issue likely requires client action", "Medium")
+    ),
+)
+
+# Default to ignore for unknown patterns
+_FALLBACK_DEFAULT = Classification("ignore", "No clear classification pattern detected", "Low")
+
+
+def _keyword_priorities(rules) -> dict:
+    """Map each keyword to the index of the earliest rule that lists it."""
+    priorities = {}
+    for priority, (keywords, _) in enumerate(rules):
+        for keyword in keywords:
+            priorities.setdefault(keyword, priority)
+    return priorities
+
+
+def _build_automaton_matcher(rules):
+    """Compile keyword rules into an Aho-Corasick automaton yielding rule priorities."""
+    automaton = ahocorasick.Automaton()
+    for keyword, priority in _keyword_priorities(rules).items():
+        automaton.add_word(keyword, priority)
+    automaton.make_automaton()
+    return lambda text: (priority for _, priority in automaton.iter(text))
+
+
+def _build_regex_matcher(rules):
+    """Compile keyword rules into one regex yielding rule priorities."""
+    priorities = _keyword_priorities(rules)
+    # The lookahead reports the highest-priority keyword starting at each position
+    pattern = re.compile(
+        "(?=(" + "|".join(re.escape(keyword) for keyword in sorted(priorities, key=priorities.get)) + "))"
+    )
+    return lambda text: (priorities[match.group(1)] for match in pattern.finditer(text))
+
+
+def _build_keyword_matcher(rules):
+    """Compile keyword rules into a single-pass matcher, preferring pyahocorasick."""
+    if ahocorasick is not None:
+        return _build_automaton_matcher(rules)
+    return _build_regex_matcher(rules)
+
+
+def _match_keyword_rule(matcher, rules, default, text: str) -> Classification:
+    """Return the classification of the highest-priority rule matching text in one pass."""
+    best = len(rules)
+    for priority in matcher(text):
+        if priority < best:
+            best = priority
+            if best == 0:
+                break
+    return rules[best][1] if best < len(rules) else default
+
+
+# Fields every Bedrock classification response must contain
+_REQUIRED_FIELDS = frozenset({'action', 'reason', 'confidence'})
+
+# Shared decoder for locating the JSON object inside model output
+_JSON_DECODER = json.JSONDecoder()
+
+_DEMO_MATCHER = _build_keyword_matcher(_DEMO_RULES)
+_FALLBACK_MATCHER = _build_keyword_matcher(_FALLBACK_RULES)
+
+# Bedrock Claude models that accept cache_control prompt caching with a
+# 1024-token minimum prefix; Haiku models need at least 2048 tokens, more
+# than the classification instructions, so they are left out
+_PROMPT_CACHE_MODELS = frozenset({
+    "anthropic.claude-3-7-sonnet-20250219-v1:0",
+    "anthropic.claude-sonnet-4-20250514-v1:0",
+    "anthropic.claude-sonnet-4-5-20250929-v1:0",
+    "anthropic.claude-opus-4-20250514-v1:0",
+    "anthropic.claude-opus-4-1-20250805-v1:0",
+})
+
+# Shortest prefix, in tokens, that the models above will cache
+_PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Bedrock usage counters recorded with each decision to measure prompt caching
+_USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens')
+
+# Cross-region inference profile prefixes that wrap a base model id
+_INFERENCE_PROFILE_PREFIXES = frozenset({"global", "us", "us-gov", "eu", "apac", "jp", "au", "ca"})
+
+
+def inference_profile_base_model(model_id: str) -> Optional[str]:
+    """Return the base model id of a cross-region inference profile id, or None for a plain model id."""
+    prefix, _, base_model_id = model_id.partition(".")
+    return base_model_id if prefix in _INFERENCE_PROFILE_PREFIXES else None
+
+
+def _supports_prompt_caching(model_id: str) -> bool:
+    """Return whether a Bedrock model id, or its inference profile, supports prompt caching."""
+    return (inference_profile_base_model(model_id) or model_id) in _PROMPT_CACHE_MODELS
+
 
 class ClassificationAgent(Agent):
     """Strand Agent for AI-powered alert classification using AWS Bedrock."""
     
-    def __init__(self):
+    def __init__(self, bedrock_client=None):
         config = AgentConfig(
             name="classification_agent",
             description="Analyzes alerts using GPT-4o via AWS Bedrock"
         )
         super().__init__(config)
-        self.bedrock_client = None
+        # An injected client is used as-is and left for its owner to close
+        self.bedrock_client = bedrock_client
+        self._exit_stack = None
+        # Bound the number of concurrent Bedrock calls; created here so an
+        # agent with an injected client works without initialize()
+        self._semaphore = asyncio.Semaphore(Config.MAX_CONCURRENCY)
+        # Token usage of completed Bedrock calls, keyed by alert id until collected
+        self._usage_by_alert: Dict[str, Dict[str, int]] = {}
         
-        # Classification prompt template
-        self.prompt_template = """
-You are an expert MSP technician analyzing NinjaRMM alerts. Classify this alert and determine the appropriate action.
-
-Alert Details:
-Device: {device_name}
-Type: {alert_type}
-Description: {description}
-Severity: {severity}
-Raw Text: {raw_text}
+        # Stable classification instructions, sent ahead of every alert so
+        # Bedrock can serve them from its prompt cache. They must stay above
+        # _PROMPT_CACHE_MIN_TOKENS, or the cache marker never takes effect.
+        self.instructions = """
+You are an expert MSP technician analyzing NinjaRMM alerts. Classify the alert that follows and determine the appropriate action.
 
 Classification Rules:
 1. REBOOT: For pending reboots, Windows updates requiring restart, or system restart alerts
@@ -35,22 +195,100 @@ Classification Rules:
 3. CREATE_TICKET: For complex technical issues requiring technician investigation
 4. IGNORE: For false positives, informational alerts, or resolved issues
 
+Action Guidance:
+- reboot: Choose this only when a restart is the complete fix. Typical alerts are pending reboots after
+  Windows or security updates, "restart required" flags from installers, and agents that report a stale
+  uptime after patching. Do not choose reboot for a stopped service, a failed backup or a hardware fault,
+  even if a restart might hide the symptom for a while.
+- notify_client: Choose this when the fix is in the client's hands rather than the technician's. Typical
+  alerts are full disks caused by user files, low batteries on unplugged devices, expiring user passwords,
+  peripherals that need to be reconnected, and hardware that has reached end of life and must be replaced
+  or purchased by the client.
+- create_ticket: Choose this when a technician has to investigate or repair something. Typical alerts are
+  stopped or crashing services, failed backups, database errors, devices or network ports that stay
+  offline, repeated failed logins or other security events, and any alert whose cause cannot be
+  determined from the text.
+- ignore: Choose this when no one needs to act. Typical alerts are informational notices, conditions that
+  have already cleared, transient failures that the agent retries on its own schedule (for example a
+  single missed antivirus definition download), and duplicates of an alert that is already being handled.
+
+Decision Order:
+When an alert matches more than one action, prefer the action that protects the client first:
+create_ticket for security events and outages of business-critical services, then reboot, then
+notify_client, then ignore. A Critical severity alert should only be ignored when the text states that
+the condition has already been resolved.
+
+Confidence:
+- High: The alert type and description clearly match a single action.
+- Medium: The action is likely, but the alert is missing details or could fit a second action.
+- Low: The alert is vague or unfamiliar and the action is a best guess; prefer create_ticket in this case.
+
+Keep the reason to one sentence that names the evidence in the alert, such as the device role, the
+failing component or the error code. Do not invent details that are not in the alert.
+
+Examples:
+
+Alert: SERVER-FILE-02 | Pending Reboot | Restart required to finish installing cumulative update KB5034441. | High
+{"action": "reboot", "reason": "Cumulative update installation is waiting on a restart", "confidence": "High"}
+
+Alert: SERVER-APP-07 | Service Stopped | IIS World Wide Web Publishing Service stopped unexpectedly. Error code: 7034. | Critical
+{"action": "create_ticket", "reason": "Web server service crashed with error 7034 and needs investigation", "confidence": "High"}
+
+Alert: LAPTOP-MKT-03 | Disk Space Low | C: drive has 4% free space. Downloads folder is using 38 GB. | High
+{"action": "notify_client", "reason": "User downloads are filling the system drive and need cleanup", "confidence": "High"}
+
+Alert: WORKSTATION-FIN-11 | Antivirus Update Failed | Definition download timed out. Next scheduled attempt in 1 hour. | Low
+{"action": "ignore", "reason": "Single timed-out definition download will be retried automatically", "confidence": "Medium"}
+
+Alert: VPN-GATEWAY-01 | Security Alert | 112 failed VPN logins for user admin from 3 countries in 20 minutes. | High
+{"action": "create_ticket", "reason": "Repeated failed admin VPN logins indicate a possible brute-force attack", "confidence": "High"}
+
+Alert: NAS-STORAGE-01 | Backup Failed | Replication job to offsite target failed. Error: Authentication rejected. | High
+{"action": "create_ticket", "reason": "Offsite replication is failing on rejected credentials", "confidence": "High"}
+
+Alert: PHONE-RECEPTION-02 | Device Offline | Desk phone unreachable since 09:12. Switch port shows link down. | Medium
+{"action": "create_ticket", "reason": "Desk phone lost its network link and needs on-site checking", "confidence": "Medium"}
+
+Alert: WORKSTATION-OPS-04 | Disk Health Warning | SMART status reports 140 reallocated sectors on drive 0. | High
+{"action": "notify_client", "reason": "Failing drive must be replaced, which the client needs to approve", "confidence": "Medium"}
+
 Respond with ONLY valid JSON in this exact format:
-{{
+{
     "action": "reboot|notify_client|create_ticket|ignore",
     "reason": "Brief explanation of why this action was chosen",
     "confidence": "High|Medium|Low"
-}}
+}
+"""
+        self._instructions_block = {"type": "text", "text": self.instructions}
+        if _supports_prompt_caching(Config.BEDROCK_MODEL_ID):
+            self._instructions_block["cache_control"] = {"type": "ephemeral"}
+        
+        # Per-alert prompt template
+        self.prompt_template = """
+Alert Details:
+Device: {device_name}
+Type: {alert_type}
+Description: {description}
+Severity: {severity}
+Raw Text: {raw_text}
 """
+        
+        # Split the template once so each alert only joins pre-parsed chunks
+        self._prompt_parts = [
+            (literal, field_name)
+            for literal, field_name, _, _ in string.Formatter().parse(self.prompt_template)
+        ]
     
     async def initialize(self):
         """Initialize AWS Bedrock client."""
         try:
+            if self.bedrock_client:
+                self.log_info("Classification agent initialized with a provided Bedrock client")
             # Check if we have AWS credentials
-            if Config.AWS_ACCESS_KEY_ID and Config.AWS_SECRET_ACCESS_KEY:
-                self.bedrock_client = boto3.client(
-                    'bedrock-runtime',
-                    **Config.get_aws_config()
+            elif Config.AWS_ACCESS_KEY_ID and Config.AWS_SECRET_ACCESS_KEY:
+                self._exit_stack = AsyncExitStack()
+                self.bedrock_client = await self._exit_stack.enter_async_context(
+                    Config.get_aio_client('bedrock-runtime')
                 )
                 self.log_info("Classification agent initialized with AWS Bedrock")
             else:
@@ -68,7 +306,7 @@ Respond with ONLY valid JSON in this exact format:
             if self.bedrock_client:
                 # Real AWS Bedrock classification
                 # Format the prompt with alert data
-                prompt = self.prompt_template.format(
+                prompt = self._render_prompt(
                     device_name=alert.device_name,
                     alert_type=alert.alert_type,
                     description=alert.description,
@@ -83,22 +321,25 @@ Respond with ONLY valid JSON in this exact format:
                     "messages": [
                         {
                             "role": "user",
-                            "content": prompt
+                            "content": [
+                                self._instructions_block,
+                                {"type": "text", "text": prompt}
+                            ]
                         }
                     ]
                 }
                 
                 # Call AWS Bedrock
-                response = self.bedrock_client.invoke_model(
-                    modelId=Config.BEDROCK_MODEL_ID,
-                    body=json.dumps(request_body),
-                    contentType='application/json'
-                )
+                async with self._semaphore:
+                    response_bytes = await self._invoke_model(orjson.dumps(request_body))
                 
                 # Parse response
-                response_body = json.loads(response['body'].read())
+                response_body = orjson.loads(response_bytes)
                 ai_response = response_body['content'][0]['text']
                 
+                usage = response_body.get('usage', {})
+                self._usage_by_alert[alert.id] = {field: usage.get(field, 0) for field in _USAGE_FIELDS}
+                
                 # Parse AI response JSON
                 classification = self._parse_ai_response(ai_response)
             else:
@@ -117,29 +358,35 @@ Respond with ONLY valid JSON in this exact format:
                 confidence="Low"
             )
     
+    async def _invoke_model(self, body: bytes) -> bytes:
+        """Invoke the Bedrock model and return the raw response body."""
+        response = await self.bedrock_client.invoke_model(
+            modelId=Config.BEDROCK_MODEL_ID,
+            body=body,
+            contentType='application/json'
+        )
+        return await response['body'].read()
+    
+    def pop_usage(self, alert_id: str) -> Optional[Dict[str, int]]:
+        """Return and forget the Bedrock token usage recorded for an alert, if any."""
+        return self._usage_by_alert.pop(alert_id, None)
+    
+    def _render_prompt(self, **fields) -> str:
+        """Render the classification prompt from the pre-parsed template."""
+        return "".join(
+            literal + (str(fields[field_name]) if field_name else "")
+            for literal, field_name in self._prompt_parts
+        )
+    
     def _parse_ai_response(self, response_text: str) -> Classification:
         """Parse and validate AI response JSON."""
         try:
-            # Clean up response text
-            response_text = response_text.strip()
-            
-            # Find JSON in response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON found in response")
-            
-            json_text = response_text[start_idx:end_idx]
-            
-            # Parse JSON
-            data = json.loads(json_text)
+            data = self._decode_json_object(response_text)
             
             # Validate required fields
-            required_fields = ['action', 'reason', 'confidence']
-            for field in required_fields:
-                if field not in data:
-                    raise ValueError(f"Missing required field: {field}")
+            missing = _REQUIRED_FIELDS - data.keys()
+            if missing:
+                raise ValueError(f"Missing required field: {', '.join(sorted(missing))}")
             
             # Create and validate classification
             classification = Classification.from_dict(data)
@@ -168,6 +415,24 @@ Respond with ONLY valid JSON in this exact format:
                 confidence="Low"
             )
     
+    def _decode_json_object(self, response_text: str) -> dict:
+        """Decode the JSON object in a model response, tolerating surrounding prose."""
+        # The model usually answers with bare JSON, which orjson parses directly
+        try:
+            data = orjson.loads(response_text)
+            if isinstance(data, dict):
+                return data
+        except orjson.JSONDecodeError:
+            pass
+        
+        # Otherwise decode the first JSON object in the response in a single pass
+        start_idx = response_text.find('{')
+        if start_idx == -1:
+            raise json.JSONDecodeError("No JSON object found", response_text, 0)
+        
+        data, _ = _JSON_DECODER.raw_decode(response_text, start_idx)
+        return data
+    
     async def classify_with_fallback(self, alert: Alert) -> Classification:
         """Classify alert with rule-based fallback if AI fails."""
         try:
@@ -179,96 +444,22 @@ Respond with ONLY valid JSON in this exact format:
             # Use enhanced demo classification instead of basic fallback
             return self._demo_classify_alert(alert)
     
+    async def classify_many(self, alerts: List[Alert]) -> List[Classification]:
+        """Classify several alerts concurrently, preserving input order."""
+        return await asyncio.gather(*(self.classify_with_fallback(alert) for alert in alerts))
+    
     def _demo_classify_alert(self, alert: Alert) -> Classification:
         """Enhanced demo classification with realistic AI-like decisions."""
-        alert_text = f"{alert.alert_type} {alert.description}".lower()
-        
-        # Reboot patterns - High confidence
-        if any(keyword in alert_text for keyword in ['reboot', 'restart', 'pending reboot', 'windows update', 'security update']):
-            return Classification(
-                action="reboot",
-                reason="System requires restart after Windows Security Updates installation",
-                confidence="High"
-            )
-        
-        # Critical system issues - High confidence
-        if any(keyword in alert_text for keyword in ['service stopped', 'sql server', 'database', 'critical error', 'system down']):
-            return Classification(
-                action="create_ticket",
-                reason="Critical SQL Server service failure requires immediate attention",
-                confidence="High"
-            )
-        
-        # Client-actionable issues - High confidence for disk space
-        if any(keyword in alert_text for keyword in ['disk space', 'storage', 'drive full', 'documents folder']):
-            return Classification(
-                action="notify_client",
-                reason="User documents folder consuming excessive space, requires client cleanup",
-                confidence="High"
-            )
-        
-        # Network/hardware issues - Medium confidence
-        if any(keyword in alert_text for keyword in ['offline', 'printer', 'network', 'connectivity', 'unreachable']):
-            return Classification(
-                action="create_ticket",
-                reason="Network connectivity issue requires technician investigation",
-                confidence="Medium"
-            )
-        
-        # Security issues - High confidence
-        if any(keyword in alert_text for keyword in ['security', 'failed login', 'firewall', 'blocked']):
-            return Classification(
-                action="create_ticket",
-                reason="Security alert requires immediate investigation",
-                confidence="High"
-            )
-        
-        # Minor issues that can be ignored - Medium confidence
-        if any(keyword in alert_text for keyword in ['antivirus update', 'temporary', 'low battery', 'retry']):
-            return Classification(
-                action="ignore",
-                reason="Temporary network issue, will retry automatically",
-                confidence="Medium"
-            )
-        
-        # Default to create ticket for unknown issues
-        return Classification(
-            action="create_ticket",
-            reason="Unknown issue pattern requires technician review",
-            confidence="Low"
-        )
+        return _match_keyword_rule(_DEMO_MATCHER, _DEMO_RULES, _DEMO_DEFAULT, alert.search_text())
     
     def _fallback_classification(self, alert: Alert) -> Classification:
         """Rule-based fallback classification."""
-        alert_text = f"{alert.alert_type} {alert.description}".lower()
-        
-        # Reboot patterns
-        if any(keyword in alert_text for keyword in ['reboot', 'restart', 'pending reboot', 'windows update']):
-            return Classification(
-                action="reboot",
-                reason="Detected reboot-related keywords in alert",
-                confidence="Medium"
-            )
-        
-        # Critical system issues
-        if any(keyword in alert_text for keyword in ['service stopped', 'system down', 'critical error']):
-            return Classification(
-                action="create_ticket",
-                reason="Critical system issue detected",
-                confidence="Medium"
-            )
-        
-        # Client-actionable issues
-        if any(keyword in alert_text for keyword in ['disk space', 'user', 'password', 'login']):
-            return Classification(
-                action="notify_client",
-                reason="Issue likely requires client action",
-                confidence="Medium"
-            )
-        
-        # Default to ignore for unknown patterns
-        return Classification(
-            action="ignore",
-            reason="No clear classification pattern detected",
-            confidence="Low"
-        )
\ No newline at end of file
+        return _match_keyword_rule(_FALLBACK_MATCHER, _FALLBACK_RULES, _FALLBACK_DEFAULT, alert.search_text())
+    
+    async def cleanup(self):
+        """Close the Bedrock client."""
+        if self._exit_stack:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+            self.bedrock_client = None
+        await super().cleanup()
@@ -1,5 +1,7 @@
-import json
-import boto3
+import asyncio
+import time
+import orjson
+from contextlib import AsyncExitStack
 from typing import Dict, Optional
 from strand_agents import Agent, AgentConfig
 from config import Config
@@ -15,16 +17,19 @@ class CredentialAgent(Agent):
         )
         super().__init__(config)
         self.secrets_client = None
+        self._exit_stack = None
         self.cached_credentials = None
+        self._cache_expires_at = 0.0
+        self._lock = asyncio.Lock()
     
     async def initialize(self):
         """Initialize AWS Secrets Manager client."""
         try:
             # Check if we have AWS credentials
             if Config.AWS_ACCESS_KEY_ID and Config.AWS_SECRET_ACCESS_KEY:
-                self.secrets_client = boto3.client(
-                    'secretsmanager',
-                    **Config.get_aws_config()
+                self._exit_stack = AsyncExitStack()
+                self.secrets_client = await self._exit_stack.enter_async_context(
+                    Config.get_aio_client('secretsmanager')
                 )
                 self.log_info("Credential agent initialized with AWS Secrets Manager")
             else:
@@ -35,18 +40,33 @@ class CredentialAgent(Agent):
     
     async def get_ninja_credentials(self) -> Dict[str, str]:
         """Retrieve NinjaRMM credentials from AWS Secrets Manager."""
-        if self.cached_credentials:
+        if self.cached_credentials and time.monotonic() < self._cache_expires_at:
             return self.cached_credentials
         
+        async with self._lock:
+            # Another coroutine may have refreshed the cache while we waited
+            if self.cached_credentials and time.monotonic() < self._cache_expires_at:
+                return self.cached_credentials
+            
+            return await self._fetch_credentials()
+    
+    async def refresh_credentials(self) -> Dict[str, str]:
+        """Drop the cached credentials and fetch them again, e.g. after an auth failure."""
+        async with self._lock:
+            self._cache_expires_at = 0.0
+            return await self._fetch_credentials()
+    
+    async def _fetch_credentials(self) -> Dict[str, str]:
+        """Fetch credentials and refresh the cache expiry."""
         try:
             if self.secrets_client:
                 self.log_info(f"Retrieving credentials from secret: {Config.NINJA_CREDENTIALS_SECRET_NAME}")
                 
-                response = self.secrets_client.get_secret_value(
+                response = await self.secrets_client.get_secret_value(
                     SecretId=Config.NINJA_CREDENTIALS_SECRET_NAME
                 )
                 
-                secret_data = json.loads(response['SecretString'])
+                secret_data = orjson.loads(response['SecretString'])
                 
                 # Validate required fields
                 required_fields = ['username', 'password']
@@ -68,6 +88,7 @@ class CredentialAgent(Agent):
                     'password': 'demo_password_123'
                 }
             
+            self._cache_expires_at = time.monotonic() + Config.CREDENTIAL_CACHE_TTL
             return self.cached_credentials
             
         except Exception as e:
@@ -81,9 +102,14 @@ class CredentialAgent(Agent):
             for key in self.cached_credentials:
                 self.cached_credentials[key] = "CLEARED"
             self.cached_credentials = None
+            self._cache_expires_at = 0.0
             self.log_info("Credentials cleared from memory")
     
     async def cleanup(self):
         """Cleanup resources when agent shuts down."""
         await self.clear_credentials()
+        if self._exit_stack:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+            self.secrets_client = None
         self.log_info("Credential agent cleanup completed")
\ No newline at end of file
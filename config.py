@@ -1,9 +1,18 @@
 import os
-from typing import Optional
-from dotenv import load_dotenv
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, Optional
 
-# Load environment variables from .env file
-load_dotenv()
+if TYPE_CHECKING:
+    import aioboto3
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+# Load environment variables from .env file, if there is one; deployments
+# that inject the environment directly don't need python-dotenv at all
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 
 class Config:
@@ -16,6 +25,7 @@ class Config:
     
     # AWS Secrets Manager
     NINJA_CREDENTIALS_SECRET_NAME = os.getenv("NINJA_CREDENTIALS_SECRET_NAME", "ninja-rmm-credentials")
+    CREDENTIAL_CACHE_TTL = int(os.getenv("CREDENTIAL_CACHE_TTL", "300"))  # seconds
     
     # AWS Bedrock
     BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
@@ -23,6 +33,7 @@ class Config:
     # NinjaRMM Configuration
     NINJA_BASE_URL = os.getenv("NINJA_BASE_URL", "https://app.ninjarmm.com")
     ALERT_LIMIT = int(os.getenv("ALERT_LIMIT", "10"))
+    NINJA_USE_API = os.getenv("NINJA_USE_API", "false").lower() in ("1", "true", "yes")  # REST API instead of browser
     
     # SuperOps Webhook
     SUPEROPS_WEBHOOK_URL = os.getenv("SUPEROPS_WEBHOOK_URL", "https://hooks.example.com/superops-ticket")
@@ -34,6 +45,23 @@ class Config:
     # Performance
     PROCESSING_TIMEOUT = int(os.getenv("PROCESSING_TIMEOUT", "300"))  # 5 minutes
     RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+    MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))  # alerts in flight
+    AWS_POOL_SIZE = int(os.getenv("AWS_POOL_SIZE", "50"))  # connections per AWS client
+    
+    # Precomputed AWS settings, read-only so callers cannot mutate them
+    _AWS_CONFIG = MappingProxyType({
+        "region_name": AWS_REGION,
+        "aws_access_key_id": AWS_ACCESS_KEY_ID,
+        "aws_secret_access_key": AWS_SECRET_ACCESS_KEY
+    })
+    
+    # AWS SDK objects, created on first use so demo runs never import boto3
+    _boto_client_config = None
+    _boto_session = None
+    _aioboto_session = None
+    
+    # Settings are fixed at import, so a successful validation holds for the process
+    _validated = False
     
     @classmethod
     def validate(cls, demo_mode: bool = False) -> bool:
@@ -41,6 +69,9 @@ class Config:
         if demo_mode:
             # In demo mode, we don't need real AWS credentials
             return True
+        
+        if cls._validated:
+            return True
             
         required_vars = [
             "AWS_ACCESS_KEY_ID",
@@ -52,13 +83,51 @@ class Config:
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
         
+        cls._validated = True
         return True
     
     @classmethod
-    def get_aws_config(cls) -> dict:
-        """Get AWS configuration dictionary."""
-        return {
-            "region_name": cls.AWS_REGION,
-            "aws_access_key_id": cls.AWS_ACCESS_KEY_ID,
-            "aws_secret_access_key": cls.AWS_SECRET_ACCESS_KEY
-        }
\ No newline at end of file
+    def get_aws_config(cls) -> Mapping[str, Optional[str]]:
+        """Get AWS configuration mapping."""
+        return cls._AWS_CONFIG
+    
+    @classmethod
+    def get_boto_client_config(cls) -> "BotoConfig":
+        """Get the shared botocore client config with pooled keep-alive connections."""
+        if cls._boto_client_config is None:
+            from botocore.config import Config as BotoConfig
+            cls._boto_client_config = BotoConfig(
+                tcp_keepalive=True,
+                retries={"mode": "standard", "max_attempts": cls.RETRY_ATTEMPTS},
+                max_pool_connections=cls.AWS_POOL_SIZE
+            )
+        return cls._boto_client_config
+    
+    @classmethod
+    def get_boto_session(cls) -> "boto3.session.Session":
+        """Get the shared boto3 session, creating it on first use."""
+        if cls._boto_session is None:
+            import boto3
+            cls._boto_session = boto3.session.Session(**cls.get_aws_config())
+        return cls._boto_session
+    
+    @classmethod
+    def get_boto_client(cls, service_name: str, client_config: Optional["BotoConfig"] = None):
+        """Create a boto3 client from the shared session, optionally with its own client config."""
+        return cls.get_boto_session().client(
+            service_name,
+            config=client_config or cls.get_boto_client_config()
+        )
+    
+    @classmethod
+    def get_aioboto_session(cls) -> "aioboto3.Session":
+        """Get the shared aioboto3 session, creating it on first use."""
+        if cls._aioboto_session is None:
+            import aioboto3
+            cls._aioboto_session = aioboto3.Session(**cls.get_aws_config())
+        return cls._aioboto_session
+    
+    @classmethod
+    def get_aio_client(cls, service_name: str):
+        """Get an async client context manager from the shared aioboto3 session."""
+        return cls.get_aioboto_session().client(service_name, config=cls.get_boto_client_config())
\ No newline at end of file
@@ -1,9 +1,23 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+VALID_SEVERITIES = frozenset({"Critical", "High", "Medium", "Low", "Info"})
+
+if sys.version_info >= (3, 11):
+    # fromisoformat accepts a trailing 'Z' natively from 3.11
+    _parse_timestamp = datetime.fromisoformat
+else:
+    def _parse_timestamp(value: str) -> datetime:
+        """Parse an ISO 8601 timestamp, accepting a trailing 'Z'."""
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+
+
+@dataclass(frozen=True, slots=True)
 class Alert:
     """Alert data structure for NinjaRMM alerts."""
     
@@ -14,14 +28,28 @@ class Alert:
     severity: str
     timestamp: datetime
     raw_text: str
+    _iso: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _search_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Validate alert data after initialization."""
         if not self.id or not self.device_name:
             raise ValueError("Alert ID and device name are required")
         
-        if self.severity not in ["Critical", "High", "Medium", "Low", "Info"]:
-            self.severity = "Medium"  # Default fallback
+        if self.severity not in VALID_SEVERITIES:
+            object.__setattr__(self, "severity", "Medium")  # Default fallback
+    
+    def iso_timestamp(self) -> str:
+        """Get the ISO 8601 timestamp, formatting it only on first use."""
+        if self._iso is None:
+            object.__setattr__(self, "_iso", self.timestamp.isoformat())
+        return self._iso
+    
+    def search_text(self) -> str:
+        """Get the lowercased type and description used for keyword matching."""
+        if self._search_text is None:
+            object.__setattr__(self, "_search_text", f"{self.alert_type} {self.description}".lower())
+        return self._search_text
     
     def to_dict(self) -> dict:
         """Convert alert to dictionary for JSON serialization."""
@@ -31,7 +59,7 @@ class Alert:
             "alert_type": self.alert_type,
             "description": self.description,
             "severity": self.severity,
-            "timestamp": self.timestamp.isoformat(),
+            "timestamp": self.iso_timestamp(),
             "raw_text": self.raw_text
         }
     
@@ -41,9 +69,7 @@ class Alert:
         # Handle timestamp conversion
         timestamp = data["timestamp"]
         if isinstance(timestamp, str):
-            if timestamp.endswith('Z'):
-                timestamp = timestamp[:-1] + '+00:00'
-            timestamp = datetime.fromisoformat(timestamp)
+            timestamp = _parse_timestamp(timestamp)
         
         return cls(
             id=data["id"],
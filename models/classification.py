@@ -2,7 +2,11 @@ from dataclasses import dataclass
 from typing import Literal
 
 
-@dataclass
+VALID_ACTIONS = frozenset({"reboot", "notify_client", "create_ticket", "ignore"})
+VALID_CONFIDENCE = frozenset({"High", "Medium", "Low"})
+
+
+@dataclass(frozen=True, slots=True)
 class Classification:
     """AI classification response structure."""
     
@@ -12,13 +16,11 @@ class Classification:
     
     def __post_init__(self):
         """Validate classification data."""
-        valid_actions = ["reboot", "notify_client", "create_ticket", "ignore"]
-        if self.action not in valid_actions:
-            raise ValueError(f"Invalid action: {self.action}. Must be one of {valid_actions}")
+        if self.action not in VALID_ACTIONS:
+            raise ValueError(f"Invalid action: {self.action}. Must be one of {sorted(VALID_ACTIONS)}")
         
-        valid_confidence = ["High", "Medium", "Low"]
-        if self.confidence not in valid_confidence:
-            raise ValueError(f"Invalid confidence: {self.confidence}. Must be one of {valid_confidence}")
+        if self.confidence not in VALID_CONFIDENCE:
+            raise ValueError(f"Invalid confidence: {self.confidence}. Must be one of {sorted(VALID_CONFIDENCE)}")
     
     def to_dict(self) -> dict:
         """Convert classification to dictionary."""
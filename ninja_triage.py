@@ -6,20 +6,22 @@ Main controller using Strand Agents framework
 
 import asyncio
 import argparse
-import json
+import logging
+import mmap
 import signal
 import sys
-from datetime import datetime
+import time
 from typing import List, Optional
+import orjson
 from strand_agents import AgentOrchestrator
 
 from config import Config
 from models.alert import Alert
-from auth.credential_manager import CredentialAgent
-from scraping.ninja_scraper import ScrapingAgent
 from ai.alert_classifier import ClassificationAgent
 from actions.executor import ActionAgent
-from utils.logger import LoggingAgent
+from utils.logger import LoggingAgent, PROGRESS_LOGGER_NAME
+
+progress = logging.getLogger(PROGRESS_LOGGER_NAME)
 
 
 class NinjaTriageOrchestrator:
@@ -29,16 +31,24 @@ class NinjaTriageOrchestrator:
         self.demo_mode = demo_mode
         self.orchestrator = AgentOrchestrator()
         
-        # Initialize agents
-        self.credential_agent = CredentialAgent()
-        self.scraping_agent = ScrapingAgent()
+        # Initialize agents; demo mode never logs in or scrapes, so the
+        # Playwright and Secrets Manager agents are only imported for live runs
+        self.credential_agent = None
+        self.scraping_agent = None
+        if not demo_mode:
+            from auth.credential_manager import CredentialAgent
+            from scraping.ninja_scraper import ScrapingAgent
+            
+            self.credential_agent = CredentialAgent()
+            self.scraping_agent = ScrapingAgent()
         self.classification_agent = ClassificationAgent()
         self.action_agent = ActionAgent()
         self.logging_agent = LoggingAgent()
         
         # Register agents with orchestrator
-        self.orchestrator.register_agent(self.credential_agent)
-        self.orchestrator.register_agent(self.scraping_agent)
+        if not demo_mode:
+            self.orchestrator.register_agent(self.credential_agent)
+            self.orchestrator.register_agent(self.scraping_agent)
         self.orchestrator.register_agent(self.classification_agent)
         self.orchestrator.register_agent(self.action_agent)
         self.orchestrator.register_agent(self.logging_agent)
@@ -47,12 +57,21 @@ class NinjaTriageOrchestrator:
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
         
-        self.shutdown_requested = False
+        self._shutdown_event = asyncio.Event()
+        self._loop = None
+    
+    @property
+    def shutdown_requested(self) -> bool:
+        """Whether a shutdown signal has been received."""
+        return self._shutdown_event.is_set()
     
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully."""
-        print(f"\n🛑 Shutdown signal received ({signum}). Finishing current alert and exiting...")
-        self.shutdown_requested = True
+        print(f"\n🛑 Shutdown signal received ({signum}). Cancelling in-flight classifications and exiting...")
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._shutdown_event.set)
+        else:
+            self._shutdown_event.set()
     
     async def initialize(self):
         """Initialize all agents."""
@@ -65,7 +84,7 @@ class NinjaTriageOrchestrator:
             # Initialize orchestrator and agents
             await self.orchestrator.initialize()
             
-            print("✅ All agents initialized successfully")
+            progress.info("✅ All agents initialized successfully")
             
         except Exception as e:
             print(f"❌ Initialization failed: {e}")
@@ -73,6 +92,7 @@ class NinjaTriageOrchestrator:
     
     async def run(self):
         """Main execution loop."""
+        self._loop = asyncio.get_running_loop()
         try:
             await self.initialize()
             
@@ -82,6 +102,7 @@ class NinjaTriageOrchestrator:
                 await self._run_production_mode()
                 
         except KeyboardInterrupt:
+            # These paths can run before or after the progress handler exists
             print("\n🛑 Interrupted by user")
         except Exception as e:
             print(f"❌ Fatal error: {e}")
@@ -92,16 +113,16 @@ class NinjaTriageOrchestrator:
     
     async def _run_demo_mode(self):
         """Run in demo mode with pre-loaded alerts."""
-        print("\n🎬 Running in DEMO mode with sample alerts...")
+        progress.info("\n🎬 Running in DEMO mode with sample alerts...")
         
         # Load demo alerts
         alerts = await self._load_demo_alerts()
         
         if not alerts:
-            print("❌ No demo alerts found")
+            progress.info("❌ No demo alerts found")
             return
         
-        print(f"📋 Processing {len(alerts)} demo alerts...\n")
+        progress.info("📋 Processing %d demo alerts...\n", len(alerts))
         
         # Process alerts
         await self._process_alerts(alerts)
@@ -111,12 +132,12 @@ class NinjaTriageOrchestrator:
     
     async def _run_production_mode(self):
         """Run in production mode with live NinjaRMM data."""
-        print("\n🔐 Retrieving credentials...")
+        progress.info("\n🔐 Retrieving credentials...")
         
         # Get credentials
         credentials = await self.credential_agent.get_ninja_credentials()
         
-        print("🌐 Logging into NinjaRMM...")
+        progress.info("🌐 Logging into NinjaRMM...")
         
         # Login to NinjaRMM
         login_success = await self.scraping_agent.login(
@@ -124,19 +145,29 @@ class NinjaTriageOrchestrator:
             credentials['password']
         )
         
+        if not login_success:
+            # The cached secret may have been rotated since it was fetched
+            fresh_credentials = await self.credential_agent.refresh_credentials()
+            if fresh_credentials != credentials:
+                progress.info("🔄 Credentials changed, retrying login...")
+                login_success = await self.scraping_agent.login(
+                    fresh_credentials['username'],
+                    fresh_credentials['password']
+                )
+        
         if not login_success:
             raise Exception("Failed to login to NinjaRMM")
         
-        print("📋 Scraping alerts from dashboard...")
+        progress.info("📋 Scraping alerts from dashboard...")
         
         # Scrape alerts
         alerts = await self.scraping_agent.scrape_alerts(Config.ALERT_LIMIT)
         
         if not alerts:
-            print("ℹ️  No alerts found to process")
+            progress.info("ℹ️  No alerts found to process")
             return
         
-        print(f"🔍 Processing {len(alerts)} alerts...\n")
+        progress.info("🔍 Processing %d alerts...\n", len(alerts))
         
         # Process alerts
         await self._process_alerts(alerts)
@@ -147,102 +178,157 @@ class NinjaTriageOrchestrator:
     async def _load_demo_alerts(self) -> List[Alert]:
         """Load alerts from demo data file."""
         try:
-            with open('data/demo_alerts.json', 'r') as f:
-                demo_data = json.load(f)
+            # Parse straight from the mapped file without copying it into memory first
+            with open('data/demo_alerts.json', 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view:
+                demo_data = orjson.loads(view)
             
-            alerts = []
-            for data in demo_data:
-                alert = Alert.from_dict(data)
-                alerts.append(alert)
-            
-            return alerts
+            return [Alert.from_dict(data) for data in demo_data]
             
         except Exception as e:
-            print(f"❌ Failed to load demo alerts: {e}")
+            progress.info("❌ Failed to load demo alerts: %s", e)
             return []
     
-    async def _process_alerts(self, alerts: List[Alert]):
-        """Process a list of alerts through the triage pipeline."""
-        for i, alert in enumerate(alerts, 1):
+    async def _process_alerts(self, alerts: List[Alert]) -> int:
+        """Process a list of alerts through the triage pipeline concurrently. Returns the number processed."""
+        semaphore = asyncio.Semaphore(Config.MAX_CONCURRENCY)
+        total = len(alerts)
+        
+        results = await asyncio.gather(
+            *(self._process_one(i, total, alert, semaphore) for i, alert in enumerate(alerts, 1)),
+            return_exceptions=True
+        )
+        
+        processed = 0
+        for i, (alert, result) in enumerate(zip(alerts, results), 1):
+            if result is True:
+                processed += 1
+            elif result is not False:
+                # _process_one handles pipeline errors itself, so anything here is unexpected
+                progress.error("❌ [%d/%d] Unhandled error for %s: %r", i, total, alert.device_name, result)
+        
+        if self.shutdown_requested and processed < total:
+            progress.info("\n🛑 Shutdown requested, stopping after %d alerts", processed)
+        return processed
+    
+    async def _process_one(self, i: int, total: int, alert: Alert, semaphore: asyncio.Semaphore) -> bool:
+        """Run one alert through the triage pipeline. Returns False if skipped for shutdown."""
+        if self.shutdown_requested:
+            return False
+        
+        async with semaphore:
             if self.shutdown_requested:
-                print(f"\n🛑 Shutdown requested, stopping after {i-1} alerts")
-                break
+                return False
             
-            print(f"🔍 [{i}/{len(alerts)}] Processing: {alert.device_name} - {alert.alert_type}")
+            progress.info("🔍 [%d/%d] Processing: %s - %s", i, total, alert.device_name, alert.alert_type)
             
-            start_time = datetime.now()
+            start_ns = time.perf_counter_ns()
             
             try:
-                # Classify alert with AI
-                classification = await self.classification_agent.classify_with_fallback(alert)
+                # Classify alert with AI, abandoning the call if shutdown is requested
+                classification = await self._until_shutdown(
+                    self.classification_agent.classify_with_fallback(alert)
+                )
+                if classification is None:
+                    progress.info("   🛑 [%d/%d] Cancelled: %s\n", i, total, alert.device_name)
+                    return False
+                
+                token_usage = self.classification_agent.pop_usage(alert.id)
                 
                 # Execute action
                 action_taken, status = await self.action_agent.execute_action(alert, classification)
                 
                 # Calculate processing time
-                processing_time = (datetime.now() - start_time).total_seconds() * 1000
+                processing_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
                 
                 # Log decision
-                await self.logging_agent.log_decision(
+                self.logging_agent.log_decision(
                     alert=alert,
                     classification=classification,
                     action_taken=action_taken,
                     execution_status=status,
-                    processing_time_ms=int(processing_time)
+                    processing_time_ms=processing_time_ms,
+                    token_usage=token_usage
                 )
                 
-                print(f"   ✅ Completed in {processing_time:.0f}ms\n")
+                progress.info("   ✅ [%d/%d] %s completed in %dms\n", i, total, alert.device_name, processing_time_ms)
                 
                 # Small delay between alerts for demo effect
                 if self.demo_mode:
                     await asyncio.sleep(1)
                 
             except Exception as e:
-                processing_time = (datetime.now() - start_time).total_seconds() * 1000
+                processing_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
                 
-                print(f"   ❌ Error: {e}")
+                progress.info("   ❌ [%d/%d] %s error: %s", i, total, alert.device_name, e)
                 
                 # Log error
-                await self.logging_agent.log_decision(
+                self.logging_agent.log_decision(
                     alert=alert,
                     classification=None,
                     action_taken="processing_failed",
                     execution_status="error",
-                    processing_time_ms=int(processing_time),
+                    processing_time_ms=processing_time_ms,
                     error_message=str(e)
                 )
+            
+            return True
+    
+    async def _until_shutdown(self, coro):
+        """Await coro unless shutdown is requested first; returns None if it was cancelled."""
+        task = asyncio.ensure_future(coro)
+        shutdown = asyncio.ensure_future(self._shutdown_event.wait())
+        try:
+            await asyncio.wait({task, shutdown}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            shutdown.cancel()
+        
+        if task.done():
+            return task.result()
+        
+        task.cancel()
+        # Let the cancellation finish before cleanup closes the clients it uses
+        await asyncio.wait({task})
+        return None
     
     async def _generate_summary(self):
         """Generate and display session summary."""
-        print("📊 Generating session summary...")
+        progress.info("📊 Generating session summary...")
         
         summary = await self.logging_agent.log_summary()
         
         if summary:
-            print("\n" + "="*60)
-            print("📈 SESSION SUMMARY")
-            print("="*60)
-            print(f"Alerts Processed: {summary['total_alerts_processed']}")
-            print(f"Session Duration: {summary['session_duration_seconds']:.1f} seconds")
-            print(f"Errors: {summary['errors_encountered']}")
+            lines = [
+                "\n" + "="*60,
+                "📈 SESSION SUMMARY",
+                "="*60,
+                f"Alerts Processed: {summary['total_alerts_processed']}",
+                f"Session Duration: {summary['session_duration_seconds']:.1f} seconds",
+                f"Errors: {summary['errors_encountered']}"
+            ]
             
             if summary['actions_breakdown']:
-                print("\nActions Taken:")
+                lines.append("\nActions Taken:")
                 for action, count in summary['actions_breakdown'].items():
-                    print(f"  • {action.replace('_', ' ').title()}: {count}")
+                    lines.append(f"  • {action.replace('_', ' ').title()}: {count}")
             
             time_savings = summary['time_savings']
-            print(f"\nTime Savings:")
-            print(f"  • Per Alert: {time_savings['per_alert_seconds']} seconds saved")
-            print(f"  • Total Saved: {time_savings['total_saved_minutes']} minutes")
-            print(f"  • Daily Projection: {time_savings['daily_projection_minutes']} minutes/day")
+            lines.extend([
+                "\nTime Savings:",
+                f"  • Per Alert: {time_savings['per_alert_seconds']} seconds saved",
+                f"  • Total Saved: {time_savings['total_saved_minutes']} minutes",
+                f"  • Daily Projection: {time_savings['daily_projection_minutes']} minutes/day",
+                "="*60
+            ])
             
-            print("="*60)
+            # Emit the whole block as one record so it is never interleaved
+            progress.info("\n".join(lines))
     
     async def _cleanup(self):
         """Cleanup all agents and resources."""
         try:
-            print("\n🧹 Cleaning up resources...")
+            progress.info("\n🧹 Cleaning up resources...")
             await self.orchestrator.shutdown()
             print("✅ Cleanup completed")
             
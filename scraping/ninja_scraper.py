@@ -1,29 +1,112 @@
 import asyncio
+import random
+import re
 from datetime import datetime
 from typing import List, Dict, Optional
+import aiohttp
+import orjson
 from playwright.async_api import async_playwright, Browser, Page
 from strand_agents import Agent, AgentConfig
 from models.alert import Alert
 from config import Config
 
 
+# Severity keywords, matched case-insensitively anywhere in the alert text
+_SEVERITY_KEYWORDS = {
+    "critical": "Critical",
+    "down": "Critical",
+    "failed": "Critical",
+    "error": "Critical",
+    "warning": "High",
+    "high": "High",
+    "info": "Low",
+    "notice": "Low"
+}
+_SEVERITY_RANK = {"Critical": 0, "High": 1, "Low": 2}
+
+# The lookahead reports overlapping keywords so no higher severity is skipped
+_SEVERITY_RE = re.compile("(?=(" + "|".join(_SEVERITY_KEYWORDS) + "))", re.IGNORECASE)
+
+
+# NinjaRMM API alert severity to Alert severity
+_API_SEVERITY = {
+    "CRITICAL": "Critical",
+    "MAJOR": "High",
+    "MODERATE": "Medium",
+    "MINOR": "Low",
+    "NONE": "Info"
+}
+
+# Collects up to `limit` element texts for each selector in a single browser round-trip
+_COLLECT_ALERT_TEXTS_JS = """
+({selectors, limit}) => selectors.map(selector => {
+    try {
+        return Array.from(document.querySelectorAll(selector), e => e.textContent).slice(0, limit);
+    } catch (e) {
+        return [];
+    }
+})
+"""
+
+
+# Sample alerts used for demonstration when no alert elements are found,
+# as (device, type, description, severity)
+_SAMPLE_ALERTS = (
+    ("SERVER-01", "Pending Reboot", "System requires restart after Windows updates installation", "High"),
+    ("WORKSTATION-05", "Disk Space Low", "C: drive has less than 10% free space remaining", "Critical"),
+    ("PRINTER-02", "Offline Device", "Network printer has been offline for 2 hours", "Medium"),
+    ("SERVER-03", "Service Stopped", "SQL Server service has stopped unexpectedly", "Critical"),
+    ("LAPTOP-12", "Antivirus Update Failed", "Unable to download latest virus definitions", "Medium"),
+)
+
+
+def _detect_severity(text: str) -> str:
+    """Return the most severe keyword severity in text, defaulting to Medium."""
+    severity = "Medium"
+    for match in _SEVERITY_RE.finditer(text):
+        found = _SEVERITY_KEYWORDS[match.group(1).lower()]
+        if severity == "Medium" or _SEVERITY_RANK[found] < _SEVERITY_RANK[severity]:
+            severity = found
+            if severity == "Critical":
+                break
+    return severity
+
+
 class ScrapingAgent(Agent):
-    """Strand Agent for NinjaRMM browser automation."""
+    """Strand Agent for collecting NinjaRMM alerts via browser automation or the REST API."""
     
-    def __init__(self):
+    def __init__(self, use_api: Optional[bool] = None):
         config = AgentConfig(
             name="scraping_agent",
-            description="Manages NinjaRMM browser automation with Playwright"
+            description="Collects NinjaRMM alerts with Playwright browser automation or the NinjaRMM API"
         )
         super().__init__(config)
+        self.use_api = Config.NINJA_USE_API if use_api is None else use_api
         self.playwright = None
         self.browser = None
         self.page = None
+        self.session = None
+        self._access_token = None
+        # API client credentials, kept to log in again when the token expires
+        self._api_credentials = None
+        self._token_lock = asyncio.Lock()
         self.is_logged_in = False
     
     async def initialize(self):
-        """Initialize Playwright browser."""
+        """Initialize Playwright browser, or an HTTP session in API mode."""
         try:
+            if self.use_api:
+                self.session = aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=30),
+                    connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+                    headers={
+                        'User-Agent': 'NinjaTriage-AI/1.0',
+                        'Accept': 'application/json'
+                    }
+                )
+                self.log_info("Scraping agent initialized for the NinjaRMM API")
+                return
+            
             self.playwright = await async_playwright().start()
             self.browser = await self.playwright.chromium.launch(
                 headless=True,
@@ -47,55 +130,82 @@ class ScrapingAgent(Agent):
         for attempt in range(max_retries):
             try:
                 self.log_info(f"Login attempt {attempt + 1}/{max_retries}")
-                
-                # Navigate to login page
-                await self.page.goto(f"{Config.NINJA_BASE_URL}/login")
-                
-                # Wait for login form
-                await self.page.wait_for_selector('input[name="username"], input[type="email"]', timeout=10000)
-                
-                # Fill credentials
-                username_selector = 'input[name="username"], input[type="email"]'
-                password_selector = 'input[name="password"], input[type="password"]'
-                
-                await self.page.fill(username_selector, username)
-                await self.page.fill(password_selector, password)
-                
-                # Submit form
-                login_button = 'button[type="submit"], input[type="submit"], button:has-text("Login"), button:has-text("Sign In")'
-                await self.page.click(login_button)
-                
-                # Wait for navigation or dashboard
-                try:
-                    await self.page.wait_for_url("**/dashboard**", timeout=15000)
-                    self.is_logged_in = True
-                    self.log_info("Successfully logged into NinjaRMM")
-                    return True
-                except:
-                    # Check if we're on a different success page
-                    current_url = self.page.url
-                    if "login" not in current_url.lower():
-                        self.is_logged_in = True
-                        self.log_info(f"Login successful, redirected to: {current_url}")
-                        return True
-                    else:
-                        raise Exception("Login failed - still on login page")
+                await self._attempt_login(username, password)
+                return True
                 
             except Exception as e:
                 self.log_warning(f"Login attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                else:
-                    self.log_error("All login attempts failed")
-                    return False
+                    # Capped exponential backoff with full jitter
+                    await asyncio.sleep(random.uniform(0, min(8, 2 ** attempt)))
         
+        self.log_error("All login attempts failed")
         return False
     
+    async def _attempt_login(self, username: str, password: str):
+        """Submit the login form once, raising if the dashboard is not reached."""
+        if self.use_api:
+            await self._api_login(username, password)
+            return
+        
+        # Navigate to login page
+        await self.page.goto(f"{Config.NINJA_BASE_URL}/login")
+        
+        # Wait for login form
+        await self.page.wait_for_selector('input[name="username"], input[type="email"]', timeout=10000)
+        
+        # Fill credentials
+        username_selector = 'input[name="username"], input[type="email"]'
+        password_selector = 'input[name="password"], input[type="password"]'
+        
+        await self.page.fill(username_selector, username)
+        await self.page.fill(password_selector, password)
+        
+        # Submit form
+        login_button = 'button[type="submit"], input[type="submit"], button:has-text("Login"), button:has-text("Sign In")'
+        await self.page.click(login_button)
+        
+        # Wait for navigation or dashboard
+        try:
+            await self.page.wait_for_url("**/dashboard**", timeout=15000)
+            self.is_logged_in = True
+            self.log_info("Successfully logged into NinjaRMM")
+        except Exception:
+            # Check if we're on a different success page
+            current_url = self.page.url
+            if "login" in current_url.lower():
+                raise Exception("Login failed - still on login page")
+            self.is_logged_in = True
+            self.log_info(f"Login successful, redirected to: {current_url}")
+    
+    async def _api_login(self, client_id: str, client_secret: str):
+        """Exchange API client credentials for an OAuth access token."""
+        async with self.session.post(
+            f"{Config.NINJA_BASE_URL}/ws/oauth/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "scope": "monitoring"
+            }
+        ) as response:
+            if response.status != 200:
+                raise Exception(f"Token request failed with HTTP {response.status}")
+            token = orjson.loads(await response.read())
+        
+        self._access_token = token["access_token"]
+        self._api_credentials = (client_id, client_secret)
+        self.is_logged_in = True
+        self.log_info("Successfully authenticated with the NinjaRMM API")
+    
     async def scrape_alerts(self, limit: int = 10) -> List[Alert]:
         """Scrape alerts from NinjaRMM dashboard."""
         if not self.is_logged_in:
             raise Exception("Must be logged in before scraping alerts")
         
+        if self.use_api:
+            return await self._fetch_api_alerts(limit)
+        
         try:
             self.log_info(f"Scraping up to {limit} alerts from dashboard")
             
@@ -107,16 +217,21 @@ class ScrapingAgent(Agent):
                 '.nav-item:has-text("Alert")'
             ]
             
-            # Try to find and click alerts navigation
-            for selector in alerts_selectors:
-                try:
-                    await self.page.click(selector, timeout=5000)
-                    break
-                except:
-                    continue
+            # Race all navigation selectors under a single timeout
+            alerts_nav = self.page.locator(alerts_selectors[0])
+            for selector in alerts_selectors[1:]:
+                alerts_nav = alerts_nav.or_(self.page.locator(selector))
+            
+            try:
+                await alerts_nav.first.click(timeout=8000)
+            except Exception as e:
+                self.log_debug(f"Alerts navigation not found: {e}")
             
             # Wait for alerts to load
-            await asyncio.sleep(3)
+            try:
+                await self.page.wait_for_load_state("networkidle", timeout=8000)
+            except Exception as e:
+                self.log_debug(f"Page did not reach network idle: {e}")
             
             # Look for alert elements with various selectors
             alert_selectors = [
@@ -129,27 +244,31 @@ class ScrapingAgent(Agent):
             
             alerts = []
             
-            # Try different alert container selectors
-            for selector in alert_selectors:
-                try:
-                    alert_elements = await self.page.query_selector_all(selector)
-                    if alert_elements:
-                        self.log_info(f"Found {len(alert_elements)} alert elements with selector: {selector}")
-                        
-                        for i, element in enumerate(alert_elements[:limit]):
-                            try:
-                                alert_data = await self._extract_alert_data(element, i)
-                                if alert_data:
-                                    alerts.append(alert_data)
-                            except Exception as e:
-                                self.log_warning(f"Failed to extract alert {i}: {e}")
-                        
-                        if alerts:
-                            break
-                            
-                except Exception as e:
-                    self.log_debug(f"Selector {selector} failed: {e}")
-                    continue
+            # One timestamp and date tag for the whole batch
+            scraped_at = datetime.now()
+            today_tag = scraped_at.strftime('%Y%m%d')
+            
+            # Fetch the texts for every selector in one round-trip to the browser
+            try:
+                texts_by_selector = await self.page.evaluate(
+                    _COLLECT_ALERT_TEXTS_JS, {"selectors": alert_selectors, "limit": limit}
+                )
+            except Exception as e:
+                self.log_debug(f"Alert text collection failed: {e}")
+                texts_by_selector = []
+            
+            # Use the first selector, in priority order, that yields alerts
+            for selector, alert_texts in zip(alert_selectors, texts_by_selector):
+                if alert_texts:
+                    self.log_info(f"Found {len(alert_texts)} alert elements with selector: {selector}")
+                    
+                    for i, text_content in enumerate(alert_texts):
+                        alert_data = self._extract_alert_data(text_content, i, scraped_at, today_tag)
+                        if alert_data:
+                            alerts.append(alert_data)
+                    
+                    if alerts:
+                        break
             
             # If no alerts found with specific selectors, try generic approach
             if not alerts:
@@ -162,11 +281,19 @@ class ScrapingAgent(Agent):
             self.log_error(f"Failed to scrape alerts: {e}")
             return []
     
-    async def _extract_alert_data(self, element, index: int) -> Optional[Alert]:
-        """Extract alert data from a DOM element."""
+    def _extract_alert_data(
+        self,
+        text_content: Optional[str],
+        index: int,
+        scraped_at: Optional[datetime] = None,
+        today_tag: Optional[str] = None
+    ) -> Optional[Alert]:
+        """Extract alert data from a DOM element's text content."""
         try:
-            # Get text content
-            text_content = await element.text_content()
+            if scraped_at is None:
+                scraped_at = datetime.now()
+            if today_tag is None:
+                today_tag = scraped_at.strftime('%Y%m%d')
             
             if not text_content or len(text_content.strip()) < 10:
                 return None
@@ -175,20 +302,13 @@ class ScrapingAgent(Agent):
             lines = [line.strip() for line in text_content.split('\n') if line.strip()]
             
             # Generate alert data
-            alert_id = f"ALT-{datetime.now().strftime('%Y%m%d')}-{index:03d}"
+            alert_id = f"ALT-{today_tag}-{index:03d}"
             device_name = lines[0] if lines else f"DEVICE-{index:03d}"
             alert_type = lines[1] if len(lines) > 1 else "Unknown Alert"
             description = ' '.join(lines[2:]) if len(lines) > 2 else text_content[:100]
             
             # Determine severity based on keywords
-            severity = "Medium"
-            text_lower = text_content.lower()
-            if any(word in text_lower for word in ['critical', 'down', 'failed', 'error']):
-                severity = "Critical"
-            elif any(word in text_lower for word in ['warning', 'high']):
-                severity = "High"
-            elif any(word in text_lower for word in ['info', 'notice']):
-                severity = "Low"
+            severity = _detect_severity(text_content)
             
             return Alert(
                 id=alert_id,
@@ -196,7 +316,7 @@ class ScrapingAgent(Agent):
                 alert_type=alert_type,
                 description=description,
                 severity=severity,
-                timestamp=datetime.now(),
+                timestamp=scraped_at,
                 raw_text=text_content
             )
             
@@ -204,58 +324,115 @@ class ScrapingAgent(Agent):
             self.log_warning(f"Failed to extract alert data: {e}")
             return None
     
+    async def _fetch_api_alerts(self, limit: int) -> List[Alert]:
+        """Fetch active alerts and device names from the NinjaRMM API."""
+        try:
+            self.log_info(f"Fetching up to {limit} alerts from the NinjaRMM API")
+            
+            alerts_data = (await self._api_get("/v2/alerts"))[:limit]
+            
+            # Alerts only carry device ids, so name just the devices they reference
+            device_names = await self._fetch_device_names(
+                {data.get("deviceId") for data in alerts_data if data.get("deviceId") is not None}
+            )
+            
+            scraped_at = datetime.now()
+            alerts = [
+                self._alert_from_api(data, i, device_names, scraped_at)
+                for i, data in enumerate(alerts_data)
+            ]
+            
+            self.log_info(f"Successfully fetched {len(alerts)} alerts")
+            return alerts
+            
+        except Exception as e:
+            self.log_error(f"Failed to fetch alerts from the NinjaRMM API: {e}")
+            return []
+    
+    async def _fetch_device_names(self, device_ids) -> Dict:
+        """Map device ids to names with one concurrent lookup per device."""
+        semaphore = asyncio.Semaphore(Config.MAX_CONCURRENCY)
+        
+        async def fetch_device(device_id):
+            async with semaphore:
+                return await self._api_get(f"/v2/device/{device_id}")
+        
+        device_ids = list(device_ids)
+        results = await asyncio.gather(*(fetch_device(device_id) for device_id in device_ids), return_exceptions=True)
+        
+        device_names = {}
+        for device_id, device in zip(device_ids, results):
+            if isinstance(device, Exception):
+                # The alert is still reported, under its device id
+                self.log_warning(f"Failed to look up device {device_id}: {device}")
+                continue
+            device_names[device_id] = device.get("systemName") or device.get("displayName")
+        return device_names
+    
+    async def _api_get(self, path: str, retry_auth: bool = True):
+        """GET a NinjaRMM API resource, logging in again once if the access token has expired."""
+        token = self._access_token
+        async with self.session.get(
+            f"{Config.NINJA_BASE_URL}{path}",
+            headers={"Authorization": f"Bearer {token}"}
+        ) as response:
+            if response.status != 401 or not retry_auth or not self._api_credentials:
+                response.raise_for_status()
+                return orjson.loads(await response.read())
+        
+        async with self._token_lock:
+            # A concurrent request may already have replaced the expired token
+            if self._access_token == token:
+                self.log_info("NinjaRMM API token expired, logging in again")
+                await self._api_login(*self._api_credentials)
+        return await self._api_get(path, retry_auth=False)
+    
+    def _alert_from_api(
+        self,
+        data: Dict,
+        index: int,
+        device_names: Dict,
+        scraped_at: datetime
+    ) -> Alert:
+        """Map a NinjaRMM API alert record onto an Alert."""
+        device_id = data.get("deviceId")
+        device_name = device_names.get(device_id) or f"DEVICE-{device_id}"
+        alert_type = data.get("sourceName") or data.get("sourceType") or "Unknown Alert"
+        description = data.get("message") or ""
+        created = data.get("createTime")
+        
+        severity = _API_SEVERITY.get(str(data.get("severity", "")).upper())
+        if severity is None:
+            severity = _detect_severity(description)
+        
+        return Alert(
+            id=str(data.get("uid") or f"ALT-{scraped_at.strftime('%Y%m%d')}-{index:03d}"),
+            device_name=device_name,
+            alert_type=alert_type,
+            description=description,
+            severity=severity,
+            timestamp=datetime.fromtimestamp(created) if created else scraped_at,
+            raw_text=f"{device_name}: {alert_type} - {description}"
+        )
+    
     async def _scrape_generic_alerts(self, limit: int) -> List[Alert]:
         """Fallback method to scrape alerts using generic selectors."""
         try:
-            # Get page content and create mock alerts for demo
-            page_content = await self.page.content()
-            
-            # Create sample alerts for demonstration
-            sample_alerts = [
-                {
-                    "device": "SERVER-01",
-                    "type": "Pending Reboot",
-                    "description": "System requires restart after Windows updates installation",
-                    "severity": "High"
-                },
-                {
-                    "device": "WORKSTATION-05",
-                    "type": "Disk Space Low",
-                    "description": "C: drive has less than 10% free space remaining",
-                    "severity": "Critical"
-                },
-                {
-                    "device": "PRINTER-02",
-                    "type": "Offline Device",
-                    "description": "Network printer has been offline for 2 hours",
-                    "severity": "Medium"
-                },
-                {
-                    "device": "SERVER-03",
-                    "type": "Service Stopped",
-                    "description": "SQL Server service has stopped unexpectedly",
-                    "severity": "Critical"
-                },
-                {
-                    "device": "LAPTOP-12",
-                    "type": "Antivirus Update Failed",
-                    "description": "Unable to download latest virus definitions",
-                    "severity": "Medium"
-                }
-            ]
+            now = datetime.now()
+            today_tag = now.strftime('%Y%m%d')
             
-            alerts = []
-            for i, sample in enumerate(sample_alerts[:limit]):
-                alert = Alert(
-                    id=f"ALT-{datetime.now().strftime('%Y%m%d')}-{i:03d}",
-                    device_name=sample["device"],
-                    alert_type=sample["type"],
-                    description=sample["description"],
-                    severity=sample["severity"],
-                    timestamp=datetime.now(),
-                    raw_text=f"{sample['device']}: {sample['type']} - {sample['description']}"
+            alerts = [
+                Alert(
+                    id=f"ALT-{today_tag}-{i:03d}",
+                    device_name=device,
+                    alert_type=alert_type,
+                    description=description,
+                    severity=severity,
+                    timestamp=now,
+                    raw_text=f"{device}: {alert_type} - {description}"
                 )
-                alerts.append(alert)
+                for i, (device, alert_type, description, severity) in enumerate(_SAMPLE_ALERTS[:limit])
+            ]
             
             self.log_info(f"Generated {len(alerts)} sample alerts for demonstration")
             return alerts
@@ -273,6 +450,9 @@ class ScrapingAgent(Agent):
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
+            if self.session:
+                await self.session.close()
+                self.session = None
             
             self.log_info("Scraping agent cleanup completed")
             
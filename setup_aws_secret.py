@@ -3,7 +3,6 @@
 Setup AWS Secrets Manager secret for NinjaRMM credentials
 """
 
-import boto3
 import json
 from config import Config
 
@@ -22,7 +21,7 @@ def create_ninja_secret():
             return False
         
         # Create secrets manager client
-        secrets_client = boto3.client('secretsmanager', **Config.get_aws_config())
+        secrets_client = Config.get_boto_client('secretsmanager')
         
         # Prepare secret data
         secret_data = {
@@ -9,7 +9,11 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 
 
-@dataclass
+# Name of the agent that owns the log handlers
+LOGGING_AGENT_NAME = "logging_agent"
+
+
+@dataclass(slots=True)
 class AgentConfig:
     """Configuration for a Strand Agent."""
     name: str
@@ -39,19 +43,23 @@ class Agent:
     
     def log_info(self, message: str):
         """Log info message."""
-        self.logger.info(f"[{self.config.name}] {message}")
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("[%s] %s", self.config.name, message)
     
     def log_warning(self, message: str):
         """Log warning message."""
-        self.logger.warning(f"[{self.config.name}] {message}")
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning("[%s] %s", self.config.name, message)
     
     def log_error(self, message: str):
         """Log error message."""
-        self.logger.error(f"[{self.config.name}] {message}")
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error("[%s] %s", self.config.name, message)
     
     def log_debug(self, message: str):
         """Log debug message."""
-        self.logger.debug(f"[{self.config.name}] {message}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("[%s] %s", self.config.name, message)
 
 
 class AgentOrchestrator:
@@ -65,18 +73,22 @@ class AgentOrchestrator:
     def register_agent(self, agent: Agent):
         """Register an agent with the orchestrator."""
         self.agents[agent.config.name] = agent
-        self.logger.info(f"Registered agent: {agent.config.name}")
+        self.logger.info("Registered agent: %s", agent.config.name)
     
     async def initialize(self):
         """Initialize all registered agents."""
         self.logger.info("Initializing agent orchestrator...")
         
-        for agent_name, agent in self.agents.items():
-            try:
-                await agent.initialize()
-            except Exception as e:
-                self.logger.error(f"Failed to initialize agent {agent_name}: {e}")
-                raise
+        # Agents are independent, so bring them up concurrently
+        results = await asyncio.gather(
+            *(agent.initialize() for agent in self.agents.values()),
+            return_exceptions=True
+        )
+        
+        for agent_name, result in zip(self.agents, results):
+            if isinstance(result, Exception):
+                self.logger.error("Failed to initialize agent %s: %s", agent_name, result)
+                raise result
         
         self.is_initialized = True
         self.logger.info("All agents initialized successfully")
@@ -85,14 +97,28 @@ class AgentOrchestrator:
         """Shutdown all agents gracefully."""
         self.logger.info("Shutting down agent orchestrator...")
         
-        for agent_name, agent in self.agents.items():
-            try:
-                await agent.cleanup()
-            except Exception as e:
-                self.logger.warning(f"Error cleaning up agent {agent_name}: {e}")
+        # The logging agent owns the log handlers, so it is cleaned up last
+        # to keep the other agents' final records
+        logging_agent = self.agents.get(LOGGING_AGENT_NAME)
+        other_agents = {name: agent for name, agent in self.agents.items() if agent is not logging_agent}
+        
+        results = await asyncio.gather(
+            *(agent.cleanup() for agent in other_agents.values()),
+            return_exceptions=True
+        )
+        
+        for agent_name, result in zip(other_agents, results):
+            if isinstance(result, Exception):
+                self.logger.warning("Error cleaning up agent %s: %s", agent_name, result)
         
         self.is_initialized = False
         self.logger.info("Agent orchestrator shutdown complete")
+        
+        if logging_agent:
+            try:
+                await logging_agent.cleanup()
+            except Exception as e:
+                self.logger.warning("Error cleaning up agent %s: %s", LOGGING_AGENT_NAME, e)
     
     def get_agent(self, name: str) -> Optional[Agent]:
         """Get an agent by name."""
@@ -3,71 +3,154 @@
 Test AWS connection and available services
 """
 
-import boto3
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 from config import Config
+from ai.alert_classifier import inference_profile_base_model
+
+
+def _probe_client_config():
+    """Client config for the probes: fail fast on bad regions or credentials."""
+    from botocore.config import Config as BotoConfig
+    return Config.get_boto_client_config().merge(BotoConfig(
+        connect_timeout=3,
+        read_timeout=10,
+        retries={"mode": "adaptive", "max_attempts": 2}
+    ))
+
+
+# The Bedrock model catalog rarely changes, so reuse its model ids for a day
+_MODELS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ninja_triage", "bedrock_model_ids.json")
+_MODELS_CACHE_TTL = 86400  # seconds
+
+
+def _load_cached_models(bedrock, path: str = _MODELS_CACHE_PATH, ttl: int = _MODELS_CACHE_TTL) -> Tuple[List[str], str]:
+    """Return Bedrock model ids and their source, refreshing the on-disk cache when stale."""
+    try:
+        is_fresh = time.time() - os.path.getmtime(path) < ttl
+    except OSError:
+        is_fresh = False
+    
+    if is_fresh:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f), "cached"
+    
+    try:
+        # Only the ids are used, so the cache never holds the full summaries
+        model_ids = [m['modelId'] for m in bedrock.list_foundation_models()['modelSummaries']]
+    except Exception:
+        # Offline or throttled: fall back to a stale catalog if there is one
+        if not os.path.exists(path):
+            raise
+        with open(path, encoding='utf-8') as f:
+            return json.load(f), "stale cache"
+    
+    # Write to a temporary file first so readers never see a partial catalog
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model_ids, f)
+    os.replace(tmp_path, path)
+    
+    return model_ids, "live"
+
+
+def _probe_sts(sts) -> List[str]:
+    """Check the caller identity; raises if AWS is unreachable."""
+    identity = sts.get_caller_identity()
+    
+    return [
+        f"✅ AWS Connection Successful!",
+        f"   Account: {identity.get('Account')}",
+        f"   User: {identity.get('Arn')}"
+    ]
+
+
+def _probe_bedrock(bedrock) -> List[str]:
+    """Check Bedrock availability and the target model."""
+    lines = ["\n🤖 Testing AWS Bedrock..."]
+    try:
+        target_model = Config.BEDROCK_MODEL_ID
+        
+        # Look the target model up directly instead of scanning the catalog;
+        # cross-region inference profile ids are not foundation model ids
+        try:
+            if inference_profile_base_model(target_model):
+                bedrock.get_inference_profile(inferenceProfileIdentifier=target_model)
+            else:
+                bedrock.get_foundation_model(modelIdentifier=target_model)
+            lines.append("✅ Bedrock Available")
+            lines.append(f"✅ Target model available: {target_model}")
+        except bedrock.exceptions.ResourceNotFoundException:
+            # Only a missing model needs the catalog, to suggest alternatives
+            model_ids, source = _load_cached_models(bedrock)
+            
+            lines.append(f"✅ Bedrock Available - {len(model_ids)} models found ({source})")
+            lines.append(f"⚠️  Target model not found: {target_model}")
+            lines.append("Available models:")
+            for model in model_ids[:5]:  # Show first 5
+                lines.append(f"   - {model}")
+    
+    except Exception as e:
+        lines.append(f"❌ Bedrock Error: {e}")
+    
+    return lines
+
+
+def _probe_secrets(secrets) -> List[str]:
+    """Check Secrets Manager permissions and the NinjaRMM credentials secret."""
+    lines = ["\n🔐 Testing AWS Secrets Manager..."]
+    try:
+        # Try to list secrets (just to test permissions)
+        response = secrets.list_secrets(MaxResults=1)
+        lines.append(f"✅ Secrets Manager Available")
+        
+        # Try to access our specific secret
+        try:
+            secret_response = secrets.get_secret_value(
+                SecretId=Config.NINJA_CREDENTIALS_SECRET_NAME
+            )
+            lines.append(f"✅ NinjaRMM credentials secret found: {Config.NINJA_CREDENTIALS_SECRET_NAME}")
+        except secrets.exceptions.ResourceNotFoundException:
+            lines.append(f"⚠️  NinjaRMM credentials secret not found: {Config.NINJA_CREDENTIALS_SECRET_NAME}")
+            lines.append("   You'll need to create this secret for production mode")
+        except Exception as e:
+            lines.append(f"❌ Secret access error: {e}")
+    
+    except Exception as e:
+        lines.append(f"❌ Secrets Manager Error: {e}")
+    
+    return lines
+
 
 def test_aws_connection():
     """Test AWS connection and list available services."""
     try:
         print("🔍 Testing AWS Connection...")
         
-        # Test basic AWS connection
-        sts = boto3.client('sts', **Config.get_aws_config())
-        identity = sts.get_caller_identity()
-        
-        print(f"✅ AWS Connection Successful!")
-        print(f"   Account: {identity.get('Account')}")
-        print(f"   User: {identity.get('Arn')}")
+        # Clients share one session and its connection pool; they are created
+        # here because sessions are not thread-safe, while clients are
+        probe_config = _probe_client_config()
+        sts = Config.get_boto_client('sts', probe_config)
+        bedrock = Config.get_boto_client('bedrock', probe_config)
+        secrets = Config.get_boto_client('secretsmanager', probe_config)
         
-        # Test Bedrock availability
-        print("\n🤖 Testing AWS Bedrock...")
-        try:
-            bedrock = boto3.client('bedrock', **Config.get_aws_config())
-            models = bedrock.list_foundation_models()
-            
-            print(f"✅ Bedrock Available - {len(models['modelSummaries'])} models found")
-            
-            # Check if our target model is available
-            target_model = Config.BEDROCK_MODEL_ID
-            available_models = [m['modelId'] for m in models['modelSummaries']]
+        # The probes are independent, so run them side by side and report
+        # in a fixed order once they have all finished
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            sts_future = executor.submit(_probe_sts, sts)
+            service_futures = [executor.submit(_probe_bedrock, bedrock), executor.submit(_probe_secrets, secrets)]
             
-            if target_model in available_models:
-                print(f"✅ Target model available: {target_model}")
-            else:
-                print(f"⚠️  Target model not found: {target_model}")
-                print("Available models:")
-                for model in available_models[:5]:  # Show first 5
-                    print(f"   - {model}")
-                
-        except Exception as e:
-            print(f"❌ Bedrock Error: {e}")
+            sts_lines = sts_future.result()
+            service_lines = [line for future in service_futures for line in future.result()]
         
-        # Test Secrets Manager
-        print("\n🔐 Testing AWS Secrets Manager...")
-        try:
-            secrets = boto3.client('secretsmanager', **Config.get_aws_config())
-            
-            # Try to list secrets (just to test permissions)
-            response = secrets.list_secrets(MaxResults=1)
-            print(f"✅ Secrets Manager Available")
-            
-            # Try to access our specific secret
-            try:
-                secret_response = secrets.get_secret_value(
-                    SecretId=Config.NINJA_CREDENTIALS_SECRET_NAME
-                )
-                print(f"✅ NinjaRMM credentials secret found: {Config.NINJA_CREDENTIALS_SECRET_NAME}")
-            except secrets.exceptions.ResourceNotFoundException:
-                print(f"⚠️  NinjaRMM credentials secret not found: {Config.NINJA_CREDENTIALS_SECRET_NAME}")
-                print("   You'll need to create this secret for production mode")
-            except Exception as e:
-                print(f"❌ Secret access error: {e}")
-                
-        except Exception as e:
-            print(f"❌ Secrets Manager Error: {e}")
+        print("\n".join(sts_lines + service_lines))
         
         return True
-        
+    
     except Exception as e:
         print(f"❌ AWS Connection Failed: {e}")
         return False
@@ -79,4 +162,4 @@ if __name__ == "__main__":
         print("\n🚀 AWS Setup Complete - Ready for Production Deployment!")
     else:
         print("\n⚠️  AWS Setup Issues - Use Demo Mode for Testing")
-        print("   Run: python ninja_triage.py --demo")
\ No newline at end of file
+        print("   Run: python ninja_triage.py --demo")
@@ -0,0 +1,36 @@
+import orjson
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, AsyncMock
+from models.alert import Alert
+
+
+@pytest.fixture(scope="session")
+def sample_alert():
+    """Create a sample alert shared by all tests."""
+    return Alert(
+        id="ALT-TEST-001",
+        device_name="TEST-SERVER-01",
+        alert_type="Pending Reboot",
+        description="System requires restart after Windows updates",
+        severity="High",
+        timestamp=datetime.now(),
+        raw_text="TEST-SERVER-01: Pending Reboot - System requires restart after Windows updates"
+    )
+
+
+def mock_async_context(entered=None):
+    """Create an AsyncMock usable as an async context manager, entering as `entered` or itself."""
+    context = AsyncMock()
+    context.__aenter__.return_value = context if entered is None else entered
+    return context
+
+
+def mock_http_response(status, payload=None, text=""):
+    """Create a mock aiohttp response usable as an async context manager."""
+    response = mock_async_context()
+    response.status = status
+    response.text.return_value = text
+    response.read.return_value = orjson.dumps(payload)
+    response.raise_for_status = Mock()
+    return response
@@ -1,24 +1,33 @@
 import pytest
 import json
-from datetime import datetime
+from dataclasses import replace
 from unittest.mock import Mock, patch, AsyncMock
-from models.alert import Alert
 from models.classification import Classification
-from ai.alert_classifier import ClassificationAgent
+from ai.alert_classifier import (
+    ClassificationAgent,
+    _DEMO_RULES,
+    _DEMO_DEFAULT,
+    _build_automaton_matcher,
+    _build_regex_matcher,
+    _match_keyword_rule,
+    _supports_prompt_caching,
+    _PROMPT_CACHE_MIN_TOKENS
+)
+from config import Config
+from tests.conftest import mock_async_context
 
 
-@pytest.fixture
-def sample_alert():
-    """Create a sample alert for testing."""
-    return Alert(
-        id="ALT-TEST-001",
-        device_name="TEST-SERVER-01",
-        alert_type="Pending Reboot",
-        description="System requires restart after Windows updates",
-        severity="High",
-        timestamp=datetime.now(),
-        raw_text="TEST-SERVER-01: Pending Reboot - System requires restart after Windows updates"
-    )
+@pytest.fixture(scope="module")
+def mock_bedrock():
+    """Create a Bedrock runtime client mock shared by the module's tests."""
+    mock_response = {'body': AsyncMock()}
+    mock_response['body'].read.return_value = json.dumps({
+        'content': [{'text': '{"action": "reboot", "reason": "Needs restart", "confidence": "High"}'}]
+    }).encode()
+    
+    client = AsyncMock()
+    client.invoke_model.return_value = mock_response
+    return client
 
 
 @pytest.fixture
@@ -69,10 +78,13 @@ class TestClassificationAgent:
     
     def test_fallback_classification_reboot(self, classification_agent, sample_alert):
         """Test fallback classification for reboot alerts."""
-        sample_alert.alert_type = "Pending Reboot"
-        sample_alert.description = "System needs restart after Windows update"
+        alert = replace(
+            sample_alert,
+            alert_type="Pending Reboot",
+            description="System needs restart after Windows update"
+        )
         
-        classification = classification_agent._fallback_classification(sample_alert)
+        classification = classification_agent._fallback_classification(alert)
         
         assert classification.action == "reboot"
         assert "reboot-related keywords" in classification.reason
@@ -80,10 +92,13 @@ class TestClassificationAgent:
     
     def test_fallback_classification_critical(self, classification_agent, sample_alert):
         """Test fallback classification for critical issues."""
-        sample_alert.alert_type = "Service Stopped"
-        sample_alert.description = "SQL Server service has stopped unexpectedly"
+        alert = replace(
+            sample_alert,
+            alert_type="Service Stopped",
+            description="SQL Server service has stopped unexpectedly"
+        )
         
-        classification = classification_agent._fallback_classification(sample_alert)
+        classification = classification_agent._fallback_classification(alert)
         
         assert classification.action == "create_ticket"
         assert "Critical system issue" in classification.reason
@@ -91,10 +106,13 @@ class TestClassificationAgent:
     
     def test_fallback_classification_client_action(self, classification_agent, sample_alert):
         """Test fallback classification for client-actionable issues."""
-        sample_alert.alert_type = "Disk Space Low"
-        sample_alert.description = "User needs to clean up disk space"
+        alert = replace(
+            sample_alert,
+            alert_type="Disk Space Low",
+            description="User needs to clean up disk space"
+        )
         
-        classification = classification_agent._fallback_classification(sample_alert)
+        classification = classification_agent._fallback_classification(alert)
         
         assert classification.action == "notify_client"
         assert "client action" in classification.reason
@@ -102,22 +120,25 @@ class TestClassificationAgent:
     
     def test_fallback_classification_unknown(self, classification_agent, sample_alert):
         """Test fallback classification for unknown patterns."""
-        sample_alert.alert_type = "Unknown Alert"
-        sample_alert.description = "Some random alert description"
+        alert = replace(
+            sample_alert,
+            alert_type="Unknown Alert",
+            description="Some random alert description"
+        )
         
-        classification = classification_agent._fallback_classification(sample_alert)
+        classification = classification_agent._fallback_classification(alert)
         
         assert classification.action == "ignore"
         assert "No clear classification pattern" in classification.reason
         assert classification.confidence == "Low"
     
     @pytest.mark.asyncio
-    @patch('boto3.client')
-    async def test_classify_alert_success(self, mock_boto_client, classification_agent, sample_alert):
+    @patch('config.Config.get_aio_client')
+    async def test_classify_alert_success(self, mock_aio_client, classification_agent, sample_alert):
         """Test successful alert classification."""
         # Mock Bedrock response
         mock_response = {
-            'body': Mock()
+            'body': AsyncMock()
         }
         mock_response['body'].read.return_value = json.dumps({
             'content': [{
@@ -125,9 +146,9 @@ class TestClassificationAgent:
             }]
         }).encode()
         
-        mock_bedrock = Mock()
+        mock_bedrock = AsyncMock()
         mock_bedrock.invoke_model.return_value = mock_response
-        mock_boto_client.return_value = mock_bedrock
+        mock_aio_client.return_value = mock_async_context(mock_bedrock)
         
         # Initialize agent
         await classification_agent.initialize()
@@ -140,13 +161,13 @@ class TestClassificationAgent:
         assert classification.confidence == "High"
     
     @pytest.mark.asyncio
-    @patch('boto3.client')
-    async def test_classify_alert_failure(self, mock_boto_client, classification_agent, sample_alert):
+    @patch('config.Config.get_aio_client')
+    async def test_classify_alert_failure(self, mock_aio_client, classification_agent, sample_alert):
         """Test alert classification failure handling."""
         # Mock Bedrock failure
-        mock_bedrock = Mock()
+        mock_bedrock = AsyncMock()
         mock_bedrock.invoke_model.side_effect = Exception("API Error")
-        mock_boto_client.return_value = mock_bedrock
+        mock_aio_client.return_value = mock_async_context(mock_bedrock)
         
         # Initialize agent
         await classification_agent.initialize()
@@ -158,6 +179,30 @@ class TestClassificationAgent:
         assert "Classification failed" in classification.reason
         assert classification.confidence == "Low"
     
+    @pytest.mark.asyncio
+    async def test_classify_alert_with_injected_client(self, mock_bedrock, sample_alert):
+        """Test an injected Bedrock client is used without creating one."""
+        with patch('config.Config.get_aio_client') as mock_aio_client:
+            agent = ClassificationAgent(bedrock_client=mock_bedrock)
+            await agent.initialize()
+            classification = await agent.classify_alert(sample_alert)
+            await agent.cleanup()
+        
+        assert classification.action == "reboot"
+        assert classification.confidence == "High"
+        mock_aio_client.assert_not_called()
+        assert agent.bedrock_client is mock_bedrock
+    
+    @pytest.mark.asyncio
+    async def test_classify_alert_with_injected_client_without_initialize(self, mock_bedrock, sample_alert):
+        """Test an agent with an injected client classifies without initialize()."""
+        agent = ClassificationAgent(bedrock_client=mock_bedrock)
+        
+        classification = await agent.classify_alert(sample_alert)
+        
+        assert classification.action == "reboot"
+        assert classification.confidence == "High"
+    
     @pytest.mark.asyncio
     async def test_classify_with_fallback_success(self, classification_agent, sample_alert):
         """Test classify_with_fallback when AI succeeds."""
@@ -184,4 +229,94 @@ class TestClassificationAgent:
             
             # Should use fallback classification
             assert result.action == "reboot"  # Based on alert type
-            assert result.confidence == "Medium"
\ No newline at end of file
+            assert result.confidence == "Medium"
+    
+    @pytest.mark.asyncio
+    async def test_classify_many_preserves_order(self, classification_agent, sample_alert):
+        """Test concurrent classification returns results in input order."""
+        results = [
+            Classification(action="reboot", reason="First", confidence="High"),
+            Classification(action="ignore", reason="Second", confidence="Low")
+        ]
+        
+        with patch.object(classification_agent, 'classify_alert', side_effect=results):
+            classifications = await classification_agent.classify_many([sample_alert, sample_alert])
+        
+        assert classifications == results
+    
+    @pytest.mark.parametrize("text", [
+        "pending reboot after windows update",
+        "printer offline, security blocked",
+        "antivirus update retry on sql server",
+        "low battery",
+        "nothing to see here",
+        ""
+    ])
+    def test_regex_matcher_agrees_with_automaton(self, text):
+        """Test the regex fallback matcher picks the same rule as pyahocorasick."""
+        pytest.importorskip("ahocorasick")
+        
+        automaton_result = _match_keyword_rule(_build_automaton_matcher(_DEMO_RULES), _DEMO_RULES, _DEMO_DEFAULT, text)
+        regex_result = _match_keyword_rule(_build_regex_matcher(_DEMO_RULES), _DEMO_RULES, _DEMO_DEFAULT, text)
+        
+        assert regex_result is automaton_result
+    
+    @pytest.mark.parametrize("model_id, expected", [
+        ("anthropic.claude-3-7-sonnet-20250219-v1:0", True),
+        ("us.anthropic.claude-3-7-sonnet-20250219-v1:0", True),
+        ("global.anthropic.claude-sonnet-4-5-20250929-v1:0", True),
+        ("anthropic.claude-3-sonnet-20240229-v1:0", False),
+        ("us.anthropic.claude-3-sonnet-20240229-v1:0", False),
+        ("anthropic.claude-3-5-haiku-20241022-v1:0", False),
+        ("meta.llama3-70b-instruct-v1:0", False)
+    ])
+    def test_supports_prompt_caching(self, model_id, expected):
+        """Test prompt caching is gated on the normalized model id."""
+        assert _supports_prompt_caching(model_id) is expected
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("model_id, cached", [
+        ("us.anthropic.claude-3-7-sonnet-20250219-v1:0", True),
+        ("anthropic.claude-3-sonnet-20240229-v1:0", False)
+    ])
+    async def test_classify_alert_marks_instructions_cacheable(self, model_id, cached, mock_bedrock, sample_alert):
+        """Test only the stable instructions block carries a cache marker."""
+        with patch.object(Config, 'BEDROCK_MODEL_ID', model_id):
+            agent = ClassificationAgent(bedrock_client=mock_bedrock)
+        await agent.initialize()
+        classification = await agent.classify_alert(sample_alert)
+        
+        assert classification.action == "reboot"
+        
+        body = json.loads(mock_bedrock.invoke_model.call_args.kwargs['body'])
+        instructions, alert_block = body['messages'][0]['content']
+        assert ('cache_control' in instructions) is cached
+        assert 'cache_control' not in alert_block
+        assert sample_alert.device_name in alert_block['text']
+    
+    def test_instructions_reach_prompt_cache_minimum(self, classification_agent):
+        """Test the cached instructions are long enough for Bedrock to cache them."""
+        # Roughly four characters per token understates Claude's token count
+        assert len(classification_agent.instructions) // 4 >= _PROMPT_CACHE_MIN_TOKENS
+    
+    @pytest.mark.asyncio
+    async def test_classify_alert_records_token_usage(self, sample_alert):
+        """Test Bedrock token usage is kept for the alert until collected."""
+        mock_response = {'body': AsyncMock()}
+        mock_response['body'].read.return_value = json.dumps({
+            'content': [{'text': '{"action": "reboot", "reason": "Needs restart", "confidence": "High"}'}],
+            'usage': {'input_tokens': 85, 'output_tokens': 30, 'cache_read_input_tokens': 1240}
+        }).encode()
+        client = AsyncMock()
+        client.invoke_model.return_value = mock_response
+        agent = ClassificationAgent(bedrock_client=client)
+        
+        await agent.classify_alert(sample_alert)
+        
+        assert agent.pop_usage(sample_alert.id) == {
+            'input_tokens': 85,
+            'output_tokens': 30,
+            'cache_read_input_tokens': 1240,
+            'cache_creation_input_tokens': 0
+        }
+        assert agent.pop_usage(sample_alert.id) is None
@@ -0,0 +1,71 @@
+import asyncio
+import orjson
+import pytest
+from unittest.mock import AsyncMock, patch
+from auth.credential_manager import CredentialAgent
+from config import Config
+
+
+def mock_secrets_client(*passwords):
+    """Create a Secrets Manager client mock returning one secret version per call."""
+    versions = iter(passwords)
+    
+    async def get_secret_value(SecretId):
+        # Yield so concurrent callers overlap while the fetch is in flight
+        await asyncio.sleep(0)
+        password = next(versions)
+        return {'SecretString': orjson.dumps({'username': 'svc@msp.example', 'password': password}).decode()}
+    
+    client = AsyncMock()
+    client.get_secret_value.side_effect = get_secret_value
+    return client
+
+
+@pytest.fixture
+def credential_agent():
+    """Create a credential agent with a mocked Secrets Manager client."""
+    agent = CredentialAgent()
+    agent.secrets_client = mock_secrets_client("first-password", "second-password")
+    return agent
+
+
+class TestCredentialAgent:
+    """Test cases for CredentialAgent."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_cold_callers_fetch_once(self, credential_agent):
+        """Test concurrent callers on a cold cache share a single Secrets Manager call."""
+        results = await asyncio.gather(*(credential_agent.get_ninja_credentials() for _ in range(5)))
+        
+        assert credential_agent.secrets_client.get_secret_value.await_count == 1
+        assert all(result['password'] == "first-password" for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_cached_credentials_reused_within_ttl(self, credential_agent):
+        """Test credentials are served from the cache until the TTL expires."""
+        await credential_agent.get_ninja_credentials()
+        credentials = await credential_agent.get_ninja_credentials()
+        
+        assert credential_agent.secrets_client.get_secret_value.await_count == 1
+        assert credentials['password'] == "first-password"
+    
+    @pytest.mark.asyncio
+    async def test_expired_ttl_forces_refetch(self, credential_agent):
+        """Test an expired cache fetches the secret again."""
+        with patch.object(Config, 'CREDENTIAL_CACHE_TTL', 0):
+            await credential_agent.get_ninja_credentials()
+            credentials = await credential_agent.get_ninja_credentials()
+        
+        assert credential_agent.secrets_client.get_secret_value.await_count == 2
+        assert credentials['password'] == "second-password"
+    
+    @pytest.mark.asyncio
+    async def test_refresh_credentials_bypasses_cache(self, credential_agent):
+        """Test refresh_credentials fetches the secret even while the cache is fresh."""
+        await credential_agent.get_ninja_credentials()
+        
+        credentials = await credential_agent.refresh_credentials()
+        
+        assert credential_agent.secrets_client.get_secret_value.await_count == 2
+        assert credentials['password'] == "second-password"
+        assert await credential_agent.get_ninja_credentials() is credentials
@@ -1,29 +1,19 @@
+import orjson
 import pytest
+import pytest_asyncio
 from unittest.mock import Mock, patch, AsyncMock
-from datetime import datetime
-from models.alert import Alert
 from models.classification import Classification
 from actions.executor import ActionAgent
+from config import Config
+from tests.conftest import mock_http_response
 
 
-@pytest.fixture
-def sample_alert():
-    """Create a sample alert for testing."""
-    return Alert(
-        id="ALT-TEST-001",
-        device_name="TEST-SERVER-01",
-        alert_type="Pending Reboot",
-        description="System requires restart after Windows updates",
-        severity="High",
-        timestamp=datetime.now(),
-        raw_text="TEST-SERVER-01: Pending Reboot - System requires restart"
-    )
-
-
-@pytest.fixture
-def action_agent():
-    """Create an action agent for testing."""
-    return ActionAgent()
+@pytest_asyncio.fixture
+async def action_agent():
+    """Create an action agent for testing, closing its HTTP session afterwards."""
+    agent = ActionAgent()
+    yield agent
+    await agent.cleanup()
 
 
 class TestActionAgent:
@@ -72,13 +62,11 @@ class TestActionAgent:
         assert status == "success"
     
     @pytest.mark.asyncio
-    @patch('requests.Session.post')
+    @patch('aiohttp.ClientSession.post')
     async def test_create_ticket_success(self, mock_post, action_agent, sample_alert):
         """Test successful ticket creation."""
         # Mock successful HTTP response
-        mock_response = Mock()
-        mock_response.status_code = 201
-        mock_post.return_value = mock_response
+        mock_post.return_value = mock_http_response(201)
         
         classification = Classification(
             action="create_ticket",
@@ -97,20 +85,18 @@ class TestActionAgent:
         call_args = mock_post.call_args
         
         # Check payload structure
-        payload = call_args[1]['json']
+        payload = orjson.loads(call_args[1]['data'])
         assert payload['title'] == f"{sample_alert.alert_type} - {sample_alert.device_name}"
         assert payload['device'] == sample_alert.device_name
         assert payload['alert_id'] == sample_alert.id
     
     @pytest.mark.asyncio
-    @patch('requests.Session.post')
-    async def test_create_ticket_failure(self, mock_post, action_agent, sample_alert):
-        """Test ticket creation failure."""
+    @patch('actions.executor.asyncio.sleep', new_callable=AsyncMock)
+    @patch('aiohttp.ClientSession.post')
+    async def test_create_ticket_failure(self, mock_post, mock_sleep, action_agent, sample_alert):
+        """Test ticket creation failure after retries are exhausted."""
         # Mock failed HTTP response
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.text = "Internal Server Error"
-        mock_post.return_value = mock_response
+        mock_post.return_value = mock_http_response(500, text="Internal Server Error")
         
         classification = Classification(
             action="create_ticket",
@@ -119,10 +105,69 @@ class TestActionAgent:
         )
         
         await action_agent.initialize()
-        action_taken, status = await action_agent._create_ticket(sample_alert, classification)
+        with patch.object(action_agent, '_dead_letter') as mock_dead_letter:
+            action_taken, status = await action_agent._create_ticket(sample_alert, classification)
         
         assert action_taken == "ticket_failed"
         assert status == "error"
+        
+        # Server errors are retried, then the payload is dead-lettered
+        assert mock_post.call_count == Config.RETRY_ATTEMPTS
+        mock_dead_letter.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('actions.executor.asyncio.sleep', new_callable=AsyncMock)
+    @patch('aiohttp.ClientSession.post')
+    async def test_create_ticket_client_error_not_retried(self, mock_post, mock_sleep, action_agent, sample_alert):
+        """Test that 4xx webhook responses are not retried."""
+        mock_post.return_value = mock_http_response(400, text="Bad Request")
+        
+        classification = Classification(
+            action="create_ticket",
+            reason="Complex technical issue",
+            confidence="High"
+        )
+        
+        await action_agent.initialize()
+        with patch.object(action_agent, '_dead_letter') as mock_dead_letter:
+            action_taken, status = await action_agent._create_ticket(sample_alert, classification)
+        
+        assert action_taken == "ticket_failed"
+        assert status == "error"
+        mock_post.assert_called_once()
+        mock_sleep.assert_not_called()
+        mock_dead_letter.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('aiohttp.ClientSession.post')
+    async def test_create_ticket_attempted_without_retries(self, mock_post, action_agent, sample_alert):
+        """Test that a non-positive RETRY_ATTEMPTS still makes one webhook attempt."""
+        mock_post.return_value = mock_http_response(201)
+        
+        classification = Classification(
+            action="create_ticket",
+            reason="Complex technical issue",
+            confidence="High"
+        )
+        
+        await action_agent.initialize()
+        with patch.object(Config, 'RETRY_ATTEMPTS', 0):
+            action_taken, status = await action_agent._create_ticket(sample_alert, classification)
+        
+        assert action_taken == "ticket_created"
+        assert status == "success"
+        mock_post.assert_called_once()
+    
+    def test_dead_letter_appends_json_lines(self, action_agent, tmp_path):
+        """Test dead-lettered payloads are appended one JSON object per line."""
+        log_file = tmp_path / "agent_log.json"
+        
+        with patch.object(Config, 'LOG_FILE', str(log_file)):
+            action_agent._dead_letter({"alert_id": "ALT-1", "title": "First"})
+            action_agent._dead_letter({"alert_id": "ALT-2", "title": "Second"})
+        
+        lines = (tmp_path / "agent_log.json.dlq").read_bytes().splitlines()
+        assert [orjson.loads(line)["alert_id"] for line in lines] == ["ALT-1", "ALT-2"]
     
     @pytest.mark.asyncio
     async def test_execute_action_dispatch(self, action_agent, sample_alert):
@@ -149,6 +194,27 @@ class TestActionAgent:
         assert action_taken == "alert_ignored"
         assert status == "success"
     
+    @pytest.mark.asyncio
+    async def test_execute_many_preserves_order(self, action_agent, sample_alert):
+        """Test concurrent action execution returns results in input order."""
+        reboot_classification = Classification(
+            action="reboot",
+            reason="System needs restart",
+            confidence="High"
+        )
+        ignore_classification = Classification(
+            action="ignore",
+            reason="False positive",
+            confidence="High"
+        )
+        
+        results = await action_agent.execute_many([
+            (sample_alert, reboot_classification),
+            (sample_alert, ignore_classification)
+        ])
+        
+        assert results == [("reboot_simulated", "success"), ("alert_ignored", "success")]
+    
     @pytest.mark.asyncio
     async def test_execute_unknown_action(self, action_agent, sample_alert):
         """Test handling of unknown action types."""
@@ -165,6 +231,12 @@ class TestActionAgent:
             assert action_taken == "unknown_action"
             assert status == "error"
     
+    def test_emit_action_skips_serializing_when_info_disabled(self, action_agent):
+        """Test action events are not serialized when INFO logging is off."""
+        # orjson cannot serialize a bare object, so serializing it would raise
+        with patch.object(action_agent.logger, 'isEnabledFor', return_value=False):
+            action_agent._emit_action({"event": "reboot_simulated", "detail": object()})
+    
     def test_map_severity_to_priority(self, action_agent):
         """Test severity to priority mapping."""
         assert action_agent._map_severity_to_priority("Critical") == "High"
@@ -0,0 +1,93 @@
+import orjson
+import pytest
+from dataclasses import replace
+from unittest.mock import patch
+from models.classification import Classification
+from utils.logger import LoggingAgent
+
+
+@pytest.fixture
+def logging_agent(tmp_path):
+    """Create a logging agent writing its audit file to a temporary directory."""
+    agent = LoggingAgent()
+    agent.log_file_path = str(tmp_path / "agent_log.json")
+    yield agent
+    if agent._log_file:
+        agent._log_file.close()
+
+
+def log_decisions(agent, sample_alert, count):
+    """Log count successful decisions with distinct alert ids."""
+    classification = Classification(action="reboot", reason="Needs restart", confidence="High")
+    for i in range(count):
+        agent.log_decision(
+            alert=replace(sample_alert, id=f"ALT-TEST-{i:03d}"),
+            classification=classification,
+            action_taken="reboot_simulated",
+            execution_status="success",
+            processing_time_ms=10
+        )
+
+
+def read_records(path):
+    """Read the NDJSON audit file, or nothing if it was never written."""
+    try:
+        with open(path, 'rb') as f:
+            return [orjson.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+class TestLoggingAgent:
+    """Test cases for LoggingAgent."""
+    
+    def test_decisions_flush_at_batch_size(self, logging_agent, sample_alert):
+        """Test decisions are buffered until a full batch is written."""
+        with patch('utils.logger._DECISION_BATCH_SIZE', 3):
+            log_decisions(logging_agent, sample_alert, 2)
+            assert read_records(logging_agent.log_file_path) == []
+            
+            log_decisions(logging_agent, sample_alert, 1)
+        
+        records = read_records(logging_agent.log_file_path)
+        assert len(records) == 3
+        assert logging_agent._pending_records == []
+    
+    @pytest.mark.asyncio
+    async def test_summary_written_after_buffered_decisions(self, logging_agent, sample_alert):
+        """Test the session summary follows every buffered decision in the audit file."""
+        log_decisions(logging_agent, sample_alert, 2)
+        
+        summary = await logging_agent.log_summary()
+        
+        records = read_records(logging_agent.log_file_path)
+        assert [record.get("alert_id") for record in records[:2]] == ["ALT-TEST-000", "ALT-TEST-001"]
+        assert records[-1]["session_type"] == "summary"
+        assert summary["total_alerts_processed"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_cleanup_flushes_remaining_decisions(self, logging_agent, sample_alert):
+        """Test cleanup writes a partial batch and closes the audit file."""
+        log_decisions(logging_agent, sample_alert, 2)
+        
+        await logging_agent.cleanup()
+        
+        assert len(read_records(logging_agent.log_file_path)) == 2
+        assert logging_agent._log_file is None
+    
+    def test_failed_flush_keeps_records_for_retry(self, logging_agent, sample_alert, tmp_path):
+        """Test a batch that cannot be written is kept, in order, for the next flush."""
+        log_path = logging_agent.log_file_path
+        # A directory cannot be opened for appending
+        logging_agent.log_file_path = str(tmp_path)
+        
+        with patch('utils.logger._DECISION_BATCH_SIZE', 2):
+            log_decisions(logging_agent, sample_alert, 2)
+        
+        assert len(logging_agent._pending_records) == 2
+        
+        logging_agent.log_file_path = log_path
+        logging_agent._flush_records()
+        
+        records = read_records(log_path)
+        assert [record["alert_id"] for record in records] == ["ALT-TEST-000", "ALT-TEST-001"]
@@ -0,0 +1,54 @@
+import logging
+import pytest
+from strand_agents import Agent, AgentConfig, AgentOrchestrator, LOGGING_AGENT_NAME
+
+
+class RecordingHandler(logging.Handler):
+    """Collect emitted log messages."""
+    
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+    
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class HandlerOwningAgent(Agent):
+    """Stand-in for the logging agent: cleanup detaches the log handler."""
+    
+    def __init__(self, handler):
+        super().__init__(AgentConfig(name=LOGGING_AGENT_NAME, description="Owns the log handler"))
+        self.handler = handler
+    
+    async def cleanup(self):
+        await super().cleanup()
+        logging.getLogger().removeHandler(self.handler)
+
+
+class TestAgentOrchestrator:
+    """Test cases for AgentOrchestrator."""
+    
+    @pytest.mark.asyncio
+    async def test_shutdown_keeps_other_agents_cleanup_records(self):
+        """Test that the logging agent is cleaned up after the other agents have logged."""
+        handler = RecordingHandler()
+        root = logging.getLogger()
+        previous_level = root.level
+        root.setLevel(logging.INFO)
+        root.addHandler(handler)
+        
+        try:
+            orchestrator = AgentOrchestrator()
+            # Register the logging agent first, as the application does
+            orchestrator.register_agent(HandlerOwningAgent(handler))
+            orchestrator.register_agent(Agent(AgentConfig(name="action_agent", description="Test agent")))
+            
+            await orchestrator.shutdown()
+        finally:
+            root.removeHandler(handler)
+            root.setLevel(previous_level)
+        
+        assert "[action_agent] Agent action_agent cleaned up" in handler.messages
+        assert "Agent orchestrator shutdown complete" in handler.messages
+        assert handler.messages[-1] == f"[{LOGGING_AGENT_NAME}] Agent {LOGGING_AGENT_NAME} cleaned up"
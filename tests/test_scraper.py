@@ -1,8 +1,10 @@
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
-from scraping.ninja_scraper import ScrapingAgent
+from scraping.ninja_scraper import ScrapingAgent, _detect_severity
 from models.alert import Alert
+from config import Config
+from tests.conftest import mock_http_response
 
 
 @pytest.fixture
@@ -11,6 +13,14 @@ def scraping_agent():
     return ScrapingAgent()
 
 
+@pytest.fixture
+def api_agent():
+    """Create a scraping agent that talks to the NinjaRMM API."""
+    agent = ScrapingAgent(use_api=True)
+    agent.session = Mock()
+    return agent
+
+
 class TestScrapingAgent:
     """Test cases for ScrapingAgent."""
     
@@ -65,10 +75,15 @@ class TestScrapingAgent:
         scraping_agent.page = mock_page
         
         # Test login failure
-        result = await scraping_agent.login("test_user", "test_pass")
+        with patch('scraping.ninja_scraper.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            result = await scraping_agent.login("test_user", "test_pass")
         
         assert result is False
         assert scraping_agent.is_logged_in is False
+        
+        # Every attempt is made, with no backoff after the last one
+        assert mock_page.goto.call_count == Config.RETRY_ATTEMPTS
+        assert mock_sleep.call_count == Config.RETRY_ATTEMPTS - 1
     
     @pytest.mark.asyncio
     async def test_scrape_alerts_not_logged_in(self, scraping_agent):
@@ -99,12 +114,9 @@ class TestScrapingAgent:
         assert first_alert.alert_type == "Pending Reboot"
         assert first_alert.severity == "High"
     
-    @pytest.mark.asyncio
-    async def test_extract_alert_data_valid(self, scraping_agent):
-        """Test extracting alert data from DOM element."""
-        # Mock DOM element
-        mock_element = AsyncMock()
-        mock_element.text_content.return_value = """
+    def test_extract_alert_data_valid(self, scraping_agent):
+        """Test extracting alert data from DOM element text."""
+        text_content = """
         SERVER-01
         Pending Reboot
         System requires restart after Windows updates
@@ -112,7 +124,7 @@ class TestScrapingAgent:
         """
         
         # Test extraction
-        alert = await scraping_agent._extract_alert_data(mock_element, 0)
+        alert = scraping_agent._extract_alert_data(text_content, 0)
         
         assert alert is not None
         assert alert.device_name == "SERVER-01"
@@ -120,30 +132,45 @@ class TestScrapingAgent:
         assert "System requires restart" in alert.description
         assert alert.severity in ["Critical", "High", "Medium", "Low"]
     
-    @pytest.mark.asyncio
-    async def test_extract_alert_data_empty(self, scraping_agent):
-        """Test extracting alert data from empty element."""
-        # Mock empty DOM element
-        mock_element = AsyncMock()
-        mock_element.text_content.return_value = ""
-        
+    @pytest.mark.parametrize("text, expected", [
+        ("info: backup job failed", "Critical"),
+        ("Update download stalled", "Critical"),
+        ("Warning: CPU usage high", "High"),
+        ("notice: warning threshold reached", "High"),
+        ("INFO notice", "Low"),
+        ("Scheduled maintenance window", "Medium"),
+        ("", "Medium")
+    ])
+    def test_detect_severity_precedence(self, text, expected):
+        """Test the most severe keyword wins, matching substrings case-insensitively."""
+        # "download" contains "down", so it counts as Critical rather than Low
+        assert _detect_severity(text) == expected
+    
+    def test_extract_alert_data_empty(self, scraping_agent):
+        """Test extracting alert data from empty element text."""
         # Test extraction
-        alert = await scraping_agent._extract_alert_data(mock_element, 0)
+        alert = scraping_agent._extract_alert_data("", 0)
         
         assert alert is None
     
     @pytest.mark.asyncio
     async def test_scrape_alerts_with_elements(self, scraping_agent):
         """Test scraping alerts when elements are found."""
-        # Mock page and elements
+        # Mock page and element texts
         mock_page = AsyncMock()
-        mock_element = AsyncMock()
-        mock_element.text_content.return_value = "SERVER-01\nPending Reboot\nSystem needs restart"
+        mock_nav = Mock()
+        mock_nav.or_.return_value = mock_nav
+        mock_nav.first.click = AsyncMock()
+        mock_page.locator = Mock(return_value=mock_nav)
+        alert_text = "SERVER-01\nPending Reboot\nSystem needs restart"
         
-        # First selector fails, second succeeds
-        mock_page.query_selector_all.side_effect = [
-            [],  # First selector returns empty
-            [mock_element, mock_element],  # Second selector returns elements
+        # First selector matches nothing, second returns element texts
+        mock_page.evaluate.return_value = [
+            [],
+            [alert_text, alert_text],
+            [],
+            [],
+            []
         ]
         
         scraping_agent.page = mock_page
@@ -154,6 +181,68 @@ class TestScrapingAgent:
         
         assert len(alerts) == 2
         assert all(isinstance(alert, Alert) for alert in alerts)
+        assert alerts[0].device_name == "SERVER-01"
+        mock_page.evaluate.assert_called_once()
+        mock_nav.first.click.assert_awaited_once_with(timeout=8000)
+    
+    @pytest.mark.asyncio
+    async def test_api_login_success(self, api_agent):
+        """Test API mode exchanges client credentials for an access token."""
+        api_agent.session.post.return_value = mock_http_response(200, {"access_token": "token-123"})
+        
+        result = await api_agent.login("client-id", "client-secret")
+        
+        assert result is True
+        assert api_agent.is_logged_in is True
+        assert api_agent._access_token == "token-123"
+        assert api_agent.session.post.call_args.kwargs['data']['client_id'] == "client-id"
+    
+    @pytest.mark.asyncio
+    async def test_fetch_api_alerts(self, api_agent):
+        """Test API alerts are mapped onto Alerts, naming only the devices they reference."""
+        missing_device = mock_http_response(404)
+        missing_device.raise_for_status.side_effect = Exception("Not Found")
+        responses = {
+            "/v2/alerts": mock_http_response(200, [
+                {"uid": "a-1", "deviceId": 7, "sourceName": "Pending Reboot", "message": "Restart required", "severity": "MAJOR", "createTime": 1730000000},
+                {"uid": "a-2", "deviceId": 9, "sourceType": "CONDITION", "message": "Disk failure", "severity": "CRITICAL"},
+                {"uid": "a-3", "deviceId": 11, "message": "Ignored by limit"}
+            ]),
+            "/v2/device/7": mock_http_response(200, {"id": 7, "systemName": "SERVER-01"}),
+            "/v2/device/9": missing_device
+        }
+        api_agent.session.get.side_effect = lambda url, **kwargs: responses[url.split(Config.NINJA_BASE_URL, 1)[1]]
+        api_agent.is_logged_in = True
+        
+        alerts = await api_agent.scrape_alerts(2)
+        
+        assert [alert.id for alert in alerts] == ["a-1", "a-2"]
+        assert alerts[0].device_name == "SERVER-01"
+        assert alerts[0].alert_type == "Pending Reboot"
+        assert alerts[0].severity == "High"
+        assert alerts[0].timestamp == datetime.fromtimestamp(1730000000)
+        assert alerts[1].device_name == "DEVICE-9"
+        assert alerts[1].severity == "Critical"
+        
+        # Device 11 belongs to an alert beyond the limit, so it is never looked up
+        assert api_agent.session.get.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_api_get_logs_in_again_on_expired_token(self, api_agent):
+        """Test a 401 response refreshes the access token and retries the request once."""
+        api_agent.session.post.return_value = mock_http_response(200, {"access_token": "token-1"})
+        await api_agent.login("client-id", "client-secret")
+        
+        responses = [mock_http_response(401), mock_http_response(200, [{"uid": "a-1"}])]
+        api_agent.session.get.side_effect = responses
+        api_agent.session.post.return_value = mock_http_response(200, {"access_token": "token-2"})
+        
+        data = await api_agent._api_get("/v2/alerts")
+        
+        assert data == [{"uid": "a-1"}]
+        assert api_agent._access_token == "token-2"
+        assert api_agent.session.post.call_count == 2
+        assert api_agent.session.get.call_args.kwargs['headers']['Authorization'] == "Bearer token-2"
     
     @pytest.mark.asyncio
     async def test_cleanup(self, scraping_agent):
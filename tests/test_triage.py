@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import pytest
+from dataclasses import replace
+from unittest.mock import Mock, patch, AsyncMock
+from models.classification import Classification
+from ninja_triage import NinjaTriageOrchestrator
+from utils.logger import PROGRESS_LOGGER_NAME
+
+
+@pytest.fixture
+def triage():
+    """Create a demo-mode triage orchestrator with the pipeline agents mocked."""
+    with patch('ninja_triage.signal.signal'):
+        orchestrator = NinjaTriageOrchestrator(demo_mode=True)
+    # Skip the per-alert demo delay
+    orchestrator.demo_mode = False
+    
+    orchestrator.classification_agent.classify_with_fallback = AsyncMock(
+        return_value=Classification(action="reboot", reason="Needs restart", confidence="High")
+    )
+    orchestrator.classification_agent.pop_usage = Mock(return_value=None)
+    orchestrator.action_agent.execute_action = AsyncMock(return_value=("reboot_simulated", "success"))
+    orchestrator.logging_agent.log_decision = Mock()
+    return orchestrator
+
+
+class TestNinjaTriageOrchestrator:
+    """Test cases for NinjaTriageOrchestrator."""
+    
+    @pytest.mark.asyncio
+    async def test_process_alerts_labels_progress_lines(self, triage, sample_alert, caplog):
+        """Test concurrent progress lines name the alert they belong to."""
+        alerts = [sample_alert, replace(sample_alert, id="ALT-TEST-002", device_name="TEST-SERVER-02")]
+        
+        with caplog.at_level(logging.INFO, logger=PROGRESS_LOGGER_NAME):
+            processed = await triage._process_alerts(alerts)
+        
+        assert processed == 2
+        assert any("[2/2] TEST-SERVER-02 completed in" in message for message in caplog.messages)
+    
+    @pytest.mark.asyncio
+    async def test_process_alerts_logs_unhandled_errors(self, triage, sample_alert, caplog):
+        """Test an exception escaping _process_one is logged and not counted as processed."""
+        alerts = [sample_alert, replace(sample_alert, id="ALT-TEST-002", device_name="TEST-SERVER-02")]
+        
+        with patch.object(triage, '_process_one', AsyncMock(side_effect=[True, RuntimeError("boom")])), \
+                caplog.at_level(logging.INFO, logger=PROGRESS_LOGGER_NAME):
+            processed = await triage._process_alerts(alerts)
+        
+        assert processed == 1
+        errors = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+        assert len(errors) == 1
+        assert "[2/2]" in errors[0] and "TEST-SERVER-02" in errors[0] and "boom" in errors[0]
+    
+    @pytest.mark.asyncio
+    async def test_shutdown_cancels_in_flight_classification(self, triage, sample_alert):
+        """Test a shutdown during a slow classification cancels it, records nothing and still cleans up."""
+        cancelled = asyncio.Event()
+        
+        async def slow_classify(alert):
+            # Shutdown arrives while the classification is in flight
+            asyncio.get_running_loop().call_soon(triage._shutdown_event.set)
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        triage.demo_mode = True
+        triage.classification_agent.classify_with_fallback = slow_classify
+        triage.orchestrator.shutdown = AsyncMock()
+        
+        with patch.object(triage, 'initialize', AsyncMock()), \
+                patch.object(triage, '_load_demo_alerts', AsyncMock(return_value=[sample_alert])), \
+                patch.object(triage, '_generate_summary', AsyncMock()):
+            await asyncio.wait_for(triage.run(), timeout=5)
+        
+        assert cancelled.is_set()
+        triage.action_agent.execute_action.assert_not_called()
+        triage.logging_agent.log_decision.assert_not_called()
+        triage.orchestrator.shutdown.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fresh_password, login_attempts", [
+        ("rotated-password", 2),
+        ("old-password", 1)
+    ])
+    async def test_login_retried_only_when_secret_changed(self, triage, fresh_password, login_attempts):
+        """Test a failed login is retried once, and only with rotated credentials."""
+        triage.credential_agent = Mock()
+        triage.credential_agent.get_ninja_credentials = AsyncMock(
+            return_value={'username': 'svc@msp.example', 'password': 'old-password'}
+        )
+        triage.credential_agent.refresh_credentials = AsyncMock(
+            return_value={'username': 'svc@msp.example', 'password': fresh_password}
+        )
+        triage.scraping_agent = Mock()
+        triage.scraping_agent.login = AsyncMock(return_value=False)
+        
+        with pytest.raises(Exception, match="Failed to login"):
+            await triage._run_production_mode()
+        
+        triage.credential_agent.refresh_credentials.assert_awaited_once()
+        assert triage.scraping_agent.login.await_count == login_attempts
+        triage.scraping_agent.login.assert_awaited_with('svc@msp.example', fresh_password)
+    
+    @pytest.mark.asyncio
+    async def test_login_succeeds_with_rotated_secret(self, triage):
+        """Test production mode continues when the retry with rotated credentials succeeds."""
+        triage.credential_agent = Mock()
+        triage.credential_agent.get_ninja_credentials = AsyncMock(
+            return_value={'username': 'svc@msp.example', 'password': 'old-password'}
+        )
+        triage.credential_agent.refresh_credentials = AsyncMock(
+            return_value={'username': 'svc@msp.example', 'password': 'rotated-password'}
+        )
+        triage.scraping_agent = Mock()
+        triage.scraping_agent.login = AsyncMock(side_effect=[False, True])
+        triage.scraping_agent.scrape_alerts = AsyncMock(return_value=[])
+        
+        await triage._run_production_mode()
+        
+        triage.scraping_agent.scrape_alerts.assert_awaited_once()
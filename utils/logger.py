@@ -1,19 +1,31 @@
-import json
 import logging
+import queue
+import sys
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from typing import Dict, Any, Optional
-from strand_agents import Agent, AgentConfig
+import orjson
+from strand_agents import Agent, AgentConfig, LOGGING_AGENT_NAME
 from models.alert import Alert
 from models.classification import Classification
 from config import Config
 
 
+# Number of buffered decision records written per batch
+_DECISION_BATCH_SIZE = 50
+
+# Logger for user-facing progress lines, printed without the log record prefix
+PROGRESS_LOGGER_NAME = "ninja.progress"
+
+
 class LoggingAgent(Agent):
     """Strand Agent for structured logging and audit trails."""
     
     def __init__(self):
         config = AgentConfig(
-            name="logging_agent",
+            name=LOGGING_AGENT_NAME,
             description="Manages structured logging and audit trails"
         )
         super().__init__(config)
@@ -21,32 +33,73 @@ class LoggingAgent(Agent):
         self.session_stats = {
             "start_time": datetime.now(),
             "alerts_processed": 0,
-            "actions_taken": {},
+            "actions_taken": Counter(),
+            "token_usage": Counter(),
             "errors": 0
         }
+        self._start_monotonic = time.monotonic()
+        self._queue_handler = None
+        self._queue_listener = None
+        self._pending_records = []
+        self._log_file = None
     
     async def initialize(self):
         """Initialize logging system."""
+        # Write records from a background thread so agents never block on stdout
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(
+            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        )
+        stream_handler.addFilter(lambda record: record.name != PROGRESS_LOGGER_NAME)
+        
+        # Progress lines share the queue but keep their plain console format
+        progress_handler = logging.StreamHandler(sys.stdout)
+        progress_handler.setFormatter(logging.Formatter('%(message)s'))
+        progress_handler.addFilter(lambda record: record.name == PROGRESS_LOGGER_NAME)
+        logging.getLogger(PROGRESS_LOGGER_NAME).setLevel(logging.INFO)
+        
+        log_queue = queue.Queue(-1)
+        self._queue_handler = QueueHandler(log_queue)
+        self._queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        self._queue_listener = QueueListener(log_queue, stream_handler, progress_handler)
+        
         # Setup Python logging
         logging.basicConfig(
             level=getattr(logging, Config.LOG_LEVEL),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            handlers=[self._queue_handler]
         )
+        self._queue_listener.start()
         self.log_info("Logging agent initialized")
     
-    async def log_decision(
+    async def cleanup(self):
+        """Flush buffered decisions and queued log records, then stop the background writer."""
+        self._flush_records()
+        if self._pending_records:
+            self.log_error(f"Dropped {len(self._pending_records)} audit records that could not be written")
+            self._pending_records = []
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+        await super().cleanup()
+        if self._queue_listener:
+            logging.getLogger().removeHandler(self._queue_handler)
+            self._queue_listener.stop()
+            self._queue_listener = None
+    
+    def log_decision(
         self, 
         alert: Alert, 
         classification: Classification, 
         action_taken: str, 
         execution_status: str,
         processing_time_ms: int,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        token_usage: Optional[Dict[str, int]] = None
     ):
-        """Log a triage decision to the audit file."""
+        """Buffer a triage decision for the audit file, writing in batches."""
         try:
             log_entry = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": datetime.now(),
                 "alert_id": alert.id,
                 "device_name": alert.device_name,
                 "alert_type": alert.alert_type,
@@ -59,14 +112,20 @@ class LoggingAgent(Agent):
             if error_message:
                 log_entry["error_message"] = error_message
             
-            # Append to log file
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            # Bedrock token usage, including prompt cache reads and writes
+            if token_usage:
+                log_entry["token_usage"] = token_usage
+                self.session_stats["token_usage"].update(token_usage)
+            
+            # Queue for the audit file, writing once a full batch accumulates
+            self._pending_records.append(orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE))
+            if len(self._pending_records) >= _DECISION_BATCH_SIZE:
+                self._flush_records()
             
             # Update session stats
             self.session_stats["alerts_processed"] += 1
             action = classification.action
-            self.session_stats["actions_taken"][action] = self.session_stats["actions_taken"].get(action, 0) + 1
+            self.session_stats["actions_taken"][action] += 1
             
             if execution_status == "error":
                 self.session_stats["errors"] += 1
@@ -80,7 +139,8 @@ class LoggingAgent(Agent):
         """Log session summary with time savings calculation."""
         try:
             end_time = datetime.now()
-            session_duration = (end_time - self.session_stats["start_time"]).total_seconds()
+            # Measure on the monotonic clock so wall-clock adjustments can't skew it
+            session_duration = time.monotonic() - self._start_monotonic
             
             # Calculate time savings (3 min manual vs 5 sec automated per alert)
             manual_time_per_alert = 180  # 3 minutes in seconds
@@ -89,12 +149,13 @@ class LoggingAgent(Agent):
             total_time_saved = self.session_stats["alerts_processed"] * time_saved_per_alert
             
             summary = {
-                "timestamp": end_time.isoformat(),
+                "timestamp": end_time,
                 "session_type": "summary",
                 "session_duration_seconds": round(session_duration, 2),
                 "total_alerts_processed": self.session_stats["alerts_processed"],
-                "actions_breakdown": self.session_stats["actions_taken"],
+                "actions_breakdown": dict(self.session_stats["actions_taken"]),
                 "errors_encountered": self.session_stats["errors"],
+                "token_usage": dict(self.session_stats["token_usage"]),
                 "time_savings": {
                     "per_alert_seconds": time_saved_per_alert,
                     "total_saved_seconds": total_time_saved,
@@ -103,9 +164,9 @@ class LoggingAgent(Agent):
                 }
             }
             
-            # Append summary to log file
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(summary) + '\n')
+            # Append summary to log file after any buffered decisions
+            self._pending_records.append(orjson.dumps(summary, option=orjson.OPT_APPEND_NEWLINE))
+            self._flush_records()
             
             self.log_info(f"Session summary logged: {self.session_stats['alerts_processed']} alerts processed, {round(total_time_saved/60, 1)} minutes saved")
             
@@ -115,6 +176,26 @@ class LoggingAgent(Agent):
             self.log_error(f"Failed to log summary: {e}")
             return None
     
+    def _flush_records(self):
+        """Append all buffered NDJSON records to the audit file in a single write."""
+        if not self._pending_records:
+            return
+        
+        records, self._pending_records = self._pending_records, []
+        try:
+            # Keep the audit file open for the whole session instead of reopening it per batch
+            if self._log_file is None:
+                self._log_file = open(self.log_file_path, 'ab')
+            self._log_file.write(b''.join(records))
+            self._log_file.flush()
+        except OSError as e:
+            # Put the batch back in order so the next flush retries it
+            self._pending_records[:0] = records
+            self.log_error(f"Failed to write {len(records)} audit records, keeping them for retry: {e}")
+    
     def get_session_stats(self) -> Dict[str, Any]:
         """Get current session statistics."""
-        return self.session_stats.copy()
\ No newline at end of file
+        stats = self.session_stats.copy()
+        stats["actions_taken"] = dict(stats["actions_taken"])
+        stats["token_usage"] = dict(stats["token_usage"])
+        return stats
\ No newline at end of file